@@ -0,0 +1,10 @@
+"""Build tooling for the manuscripts in this repository.
+
+Run ``python -m booktool --help`` from the repository root for the list of
+stages. Per-book state (manifests, caches, the stats index, exported
+fragments) lives under ``<book>/.booktool/``; state that spans books -- the
+search index, the near-duplicate signatures and the trace file -- lives under
+``<repo>/.booktool/``. Both are ignored by git and safe to delete.
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,219 @@
+"""Incremental assembly of the ``<part>_完整.md`` files.
+
+Each part file is the part header followed by every section body (front
+matter removed) separated by ``---`` rules. The manifest in
+``.booktool/assembly.json`` records, per section, the source ``stat`` key, a
+content hash and the byte span the section occupies in the part file. On the
+next run:
+
+* a part whose sections and output are all unchanged is skipped without
+  reading anything but ``stat`` results;
+* a part where only some sections changed is *spliced*: the untouched spans
+  are copied from the previous output and only the changed sections are
+  re-read and re-rendered;
+* added, removed or reordered sections fall back to a full rebuild of that
+  part.
+
+A part file booktool did not write -- one with no manifest entry, or whose
+content no longer matches the hash recorded when it was written -- is left
+alone and reported as *protected*: the hand-maintained part files in the
+repo keep section front matter and chapters that exist in no section file,
+and a rebuild would drop them. ``--force`` rebuilds them anyway. Even then
+an output whose bytes would not change is not rewritten.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .book import Book, Section, split_front_matter
+from .fsutil import atomic_write_bytes, atomic_write_json, load_json, sha1_bytes, stat_key
+from .trace import span
+
+MANIFEST_NAME = "assembly.json"
+MANIFEST_VERSION = 1
+SEPARATOR = b"\n\n---\n\n"
+
+
+@dataclass
+class AssemblyReport:
+    written: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    protected: list[str] = field(default_factory=list)
+    rebuilt_sections: int = 0
+    reused_sections: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        protected = f", {len(self.protected)} protected" if self.protected else ""
+        return (
+            f"{len(self.written)} part(s) written, {len(self.skipped)} unchanged{protected}; "
+            f"{self.rebuilt_sections} section(s) rendered, {self.reused_sections} reused "
+            f"in {self.elapsed * 1000:.1f} ms"
+        )
+
+
+def render_section(raw: bytes) -> bytes:
+    """Body of a section as it appears in the part file, separator included."""
+    _, body = split_front_matter(raw.decode("utf-8"))
+    return SEPARATOR + body.strip().encode("utf-8")
+
+
+def part_header(book: Book, part: str) -> bytes:
+    """Keep a hand-written ``# 第二部分：实战指南`` title if the part file has one."""
+    output = book.part_output(part)
+    try:
+        with open(output, "rb") as fh:
+            first = fh.readline().decode("utf-8").rstrip("\n")
+    except (FileNotFoundError, UnicodeDecodeError):
+        first = ""
+    if first.startswith("# ") and part in first:
+        return first.encode("utf-8")
+    return f"# {part}".encode("utf-8")
+
+
+class Assembler:
+    def __init__(self, book: Book, force: bool = False):
+        self.book = book
+        self.force = force
+        self.manifest_path = book.state_dir / MANIFEST_NAME
+        manifest = load_json(self.manifest_path, {})
+        if manifest.get("version") != MANIFEST_VERSION:
+            manifest = {"version": MANIFEST_VERSION, "parts": {}}
+        self.manifest = manifest
+        self.dirty = False
+
+    def run(self, report: AssemblyReport | None = None) -> AssemblyReport:
+        report = report or AssemblyReport()
+        started = time.perf_counter()
+        parts = self.book.parts()
+        for part, sections in parts.items():
+            entry = self._assemble_part(part, sections, report)
+            if entry is not None:
+                self.manifest["parts"][part] = entry
+                self.dirty = True
+        for stale in set(self.manifest["parts"]) - set(parts):
+            del self.manifest["parts"][stale]
+            self.dirty = True
+        if self.dirty or not self.manifest_path.exists():
+            atomic_write_json(self.manifest_path, self.manifest)
+        report.elapsed += time.perf_counter() - started
+        return report
+
+    def _assemble_part(self, part: str, sections: list[Section], report: AssemblyReport) -> dict | None:
+        output = self.book.part_output(part)
+        label = f"{self.book.name}/{part}"
+        previous = None if self.force else self.manifest["parts"].get(part)
+        if previous and not self._output_matches(output, previous):
+            previous = None
+        if previous is None and not self.force and output.exists():
+            report.protected.append(label)
+            return None
+
+        old_spans = {}
+        if previous and [s["path"] for s in previous["sections"]] == [s.rel for s in sections]:
+            old_spans = {s["path"]: s for s in previous["sections"]}
+
+        changed = []
+        for section in sections:
+            old = old_spans.get(section.rel)
+            if old is None or tuple(old["stat"]) != stat_key(section.path):
+                changed.append(section)
+
+        if old_spans and not changed:
+            report.skipped.append(label)
+            report.reused_sections += len(sections)
+            if tuple(previous["output_stat"]) == stat_key(output):
+                return None
+            # Same content under a new mtime (a checkout, a touch): refresh the stat key.
+            return {**previous, "output_stat": list(stat_key(output))}
+
+        old_output = output.read_bytes() if old_spans or output.exists() else b""
+        header = old_output[: previous["header_end"]] if old_spans else part_header(self.book, part)
+        chunks = [header]
+        offset = len(header)
+        entries = []
+        for section in sections:
+            old = old_spans.get(section.rel)
+            if section in changed:
+                raw = section.path.read_bytes()
+                digest = sha1_bytes(raw)
+                if old is not None and old["sha1"] == digest:
+                    # Touched but not edited: the old span is still valid.
+                    chunk = old_output[old["start"] : old["end"]]
+                    report.reused_sections += 1
+                else:
+                    chunk = render_section(raw)
+                    report.rebuilt_sections += 1
+            else:
+                digest = old["sha1"]
+                chunk = old_output[old["start"] : old["end"]]
+                report.reused_sections += 1
+            chunks.append(chunk)
+            entries.append(
+                {
+                    "path": section.rel,
+                    "stat": list(stat_key(section.path)),
+                    "sha1": digest,
+                    "start": offset,
+                    "end": offset + len(chunk),
+                }
+            )
+            offset += len(chunk)
+        chunks.append(b"\n")
+        data = b"".join(chunks)
+
+        if data == old_output:
+            report.skipped.append(label)
+        else:
+            atomic_write_bytes(output, data)
+            report.written.append(label)
+        return {
+            "output": output.relative_to(self.book.root).as_posix(),
+            "header_end": len(header),
+            "output_stat": list(stat_key(output)),
+            "output_sha1": sha1_bytes(data),
+            "sections": entries,
+        }
+
+    @staticmethod
+    def _output_matches(output: Path, previous: dict) -> bool:
+        """Whether the part file is still exactly what the last run wrote."""
+        try:
+            if tuple(previous["output_stat"]) == stat_key(output):
+                return True
+            return previous.get("output_sha1") == sha1_bytes(output.read_bytes())
+        except FileNotFoundError:
+            return False
+
+
+def assemble_books(books: list[Book], force: bool = False) -> AssemblyReport:
+    report = AssemblyReport()
+    for book in books:
+        with span("assemble.book", book=book.name):
+            Assembler(book, force=force).run(report)
+    return report
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("assemble", help="rebuild the <part>_完整.md files incrementally")
+    parser.add_argument("books", nargs="*", help="book directories (default: every book in the repo)")
+    parser.add_argument(
+        "--force", action="store_true",
+        help="ignore the manifest and rebuild every part, including part files booktool did not write",
+    )
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    from .book import resolve_books
+
+    report = assemble_books(resolve_books(args.books), force=args.force)
+    for label in report.written:
+        print(f"wrote {label}")
+    for label in report.protected:
+        print(f"kept {label}: not written by booktool or edited since (--force to rebuild)")
+    print(report.summary())
+    return 0
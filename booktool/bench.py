@@ -0,0 +1,331 @@
+"""Reproducible end-to-end benchmark on a synthetic book.
+
+``python -m booktool bench`` writes a book of ``--sections`` sections (eight
+parts, an outline with word budgets, bodies with lists, tables and JSON, bash
+and Python code blocks) into a scratch directory, all derived from ``--seed``.
+It then runs every stage against it twice, each stage in its own trace span:
+
+* a *cold* pass on empty caches: research, drafting and review through the
+  pipeline with :class:`booktool.llm.StubModel`, assembly of the
+  ``*_完整.md`` files, progress regeneration, coverage, code-block
+  validation, the search index, near-duplicate detection and export;
+* a *warm* pass after editing a few sections, which measures the
+  incremental paths. The pipeline reruns research and review for the edited
+  sections only: research prompts do not include the body, so they are
+  response-cache hits, while the reviews are new model calls.
+
+The whole run is repeated ``--repeat`` times on a fresh corpus and each stage
+reports its fastest time and lowest peak RSS, which keeps scheduler and disk
+noise (and the heap retained from earlier runs) out of the numbers.
+
+The table shows seconds, sections per second, peak RSS and tokens per stage.
+``--save`` writes the numbers as JSON and ``--baseline`` compares against
+such a file, exiting with status 1 when a stage got slower or bigger by more
+than ``--tolerance``. Timings are only comparable on the same machine, so
+keep baselines local.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .assemble import assemble_books
+from .book import load_book
+from .cache import open_cache
+from .coverage import CoverageIndex
+from .dedup import INDEX_NAME, SignatureStore, find_duplicates
+from .export import Exporter, _init_worker
+from .llm import StubModel
+from .pipeline import run_pipeline
+from .progress import regenerate
+from .search import SearchIndex
+from .trace import capture, span
+from .validate import Validator
+
+BOOK_NAME = "基准测试书"
+PARTS = 8
+STATUSES = ("outline", "researched", "draft", "draft")
+EDIT_SHARE = 0.05
+# Changes smaller than these are noise, whatever the tolerance says.
+MIN_SECONDS = 0.05
+MIN_RSS = 8 * 2**20
+
+_CN_PARTS = "一二三四五六七八"
+_TOPICS = [
+    "智能体", "工作流", "记忆管理", "工具调用", "提示工程", "任务规划", "多智能体协作", "检索增强",
+    "评测体系", "安全边界", "成本控制", "部署运维", "技能市场", "上下文窗口", "插件生态", "人机协同",
+]
+_ASPECTS = ["原理", "实战", "案例", "陷阱", "演进", "架构", "最佳实践", "度量"]
+_SENTENCES = [
+    "开发者最先遇到的问题往往不是模型能力，而是上下文如何组织。",
+    "把复杂任务拆成可验证的小步骤，是让智能体稳定工作的关键。",
+    "每一次工具调用都应该有明确的输入、输出和失败处理。",
+    "日志和追踪数据决定了你能否在出问题时快速定位原因。",
+    "成本随调用次数线性增长，缓存和批处理是最直接的手段。",
+    "团队在上线前需要一套可重复的评测集，而不是凭感觉判断效果。",
+    "权限最小化原则同样适用于智能体可以访问的文件和接口。",
+    "记忆系统需要在召回率和噪声之间取得平衡。",
+    "We measure latency at the 95th percentile, not the mean.",
+    "A skill is a folder with a manifest, prompts and scripts.",
+]
+
+
+def _body(rng: random.Random, title: str, index: int) -> str:
+    lines = [f"# {title}", ""]
+    for n in range(rng.randint(3, 5)):
+        lines += [f"## {rng.choice(_ASPECTS)}之{n + 1}", ""]
+        lines += ["".join(rng.choice(_SENTENCES) for _ in range(rng.randint(3, 6))), ""]
+        kind = (index + n) % 4
+        if kind == 0:
+            lines += [f"- {rng.choice(_TOPICS)}：{rng.choice(_SENTENCES)}" for _ in range(rng.randint(3, 5))] + [""]
+        elif kind == 1:
+            lines += ["| 指标 | 数值 | 说明 |", "|------|------|------|"]
+            lines += [f"| {rng.choice(_TOPICS)} | {rng.randint(1, 999)} | {rng.choice(_ASPECTS)} |" for _ in range(4)]
+            lines += [""]
+        elif kind == 2:
+            config = {"name": f"skill-{index}-{n}", "timeout": rng.randint(5, 60), "tools": ["shell", "browser"]}
+            lang, code = rng.choice([
+                ("json", json.dumps(config, ensure_ascii=False, indent=2)),
+                ("bash", f"mkdir -p skills/skill-{index}\ncd skills/skill-{index} && ls -la"),
+                ("python", f"def handle(task):\n    return {{'id': {index}, 'step': {n}, 'ok': True}}"),
+            ])
+            lines += [f"```{lang}", code, "```", ""]
+        else:
+            lines += [f"> {rng.choice(_SENTENCES)}", ""]
+    return "\n".join(lines)
+
+
+def build_corpus(root: Path, sections: int, seed: int = 0) -> Path:
+    """Write the synthetic book under ``root``; return the book directory."""
+    rng = random.Random(seed)
+    book_dir = root / BOOK_NAME
+    parts = min(PARTS, sections)
+    per_part = -(-sections // parts)
+    target = 3000
+    outline = [f"# 《{BOOK_NAME}》", "", f"> **篇幅**：约{sections * target / 10000:g}万字", ""]
+    entries = []
+    written = 0
+    for p in range(parts):
+        part = f"第{_CN_PARTS[p]}部分"
+        count = min(per_part, sections - written)
+        if count <= 0:
+            break
+        outline += [f"## 【{part}】{_TOPICS[p]}（{count * target}字）", ""]
+        for k in range(1, count + 1):
+            section_id = f"{p + 1}.{k}"
+            title = f"{_TOPICS[(p + k) % len(_TOPICS)]}{_ASPECTS[k % len(_ASPECTS)]}第{k}讲"
+            status = STATUSES[written % len(STATUSES)]
+            outline += [f"**{section_id} {title}**", ""]
+            outline += [f"- {rng.choice(_TOPICS)}{rng.choice(_ASPECTS)}" for _ in range(3)] + [""]
+            front = [
+                "---", f"section_id: {section_id}", f"title: {title}", f"status: {status}",
+                f"target_words: {target}", "word_count: 0", "---", "",
+            ]
+            path = book_dir / part / f"{section_id}_{title}.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("\n".join(front) + _body(rng, title, written) + "\n", encoding="utf-8")
+            entries.append({
+                "section_id": section_id, "title": title, "chapter": part, "status": status,
+                "word_count": 0, "target_words": target,
+            })
+            written += 1
+    (book_dir / f"{BOOK_NAME}-大纲.md").write_text("\n".join(outline) + "\n", encoding="utf-8")
+    progress = {"total_sections": written, "sections": entries}
+    (book_dir / "progress.json").write_text(json.dumps(progress, ensure_ascii=False, indent=2), encoding="utf-8")
+    return book_dir
+
+
+def edit_sections(book_dir: Path, share: float = EDIT_SHARE, seed: int = 0) -> set[str]:
+    """Append a paragraph to a seeded sample of sections; return their paths."""
+    book = load_book(book_dir)
+    rng = random.Random(seed + 1)
+    chosen = rng.sample(book.sections, max(1, round(len(book.sections) * share)))
+    for section in chosen:
+        with open(section.path, "a", encoding="utf-8") as fh:
+            fh.write(f"\n## 补充\n\n{rng.choice(_SENTENCES)}{rng.choice(_SENTENCES)}\n")
+    return {section.rel for section in chosen}
+
+
+def run_stages(
+    work: Path, book_dir: Path, phase: str, args, pool: ProcessPoolExecutor | None, edited: set[str] | None = None
+) -> dict[str, int]:
+    """Run every stage once inside ``bench.<phase>.<stage>`` spans; return items per stage.
+
+    With ``edited`` the pipeline reruns research and review for those sections only.
+    """
+    items: dict[str, int] = {}
+    model = StubModel(latency=args.latency, seed=args.seed)
+    sections = len(load_book(book_dir).sections)
+
+    with span(f"bench.{phase}.pipeline"):
+        book = load_book(book_dir)
+        with open_cache(book) as cache:
+            if edited:
+                scheduler = run_pipeline(
+                    book, model, args.workers, ("research", "review"), only=edited, cache=cache, rerun=True, backoff=0.0
+                )
+            else:
+                scheduler = run_pipeline(book, model, args.workers, cache=cache, backoff=0.0)
+        items["pipeline"] = scheduler.report.completed
+    with span(f"bench.{phase}.assemble"):
+        assemble_books([load_book(book_dir)])
+        items["assemble"] = sections
+    with span(f"bench.{phase}.progress"):
+        regenerate(load_book(book_dir))
+        items["progress"] = sections
+    with span(f"bench.{phase}.coverage"):
+        CoverageIndex(load_book(book_dir)).report()
+        items["coverage"] = sections
+    with span(f"bench.{phase}.validate"):
+        Validator(load_book(book_dir)).run(pool)
+        items["validate"] = sections
+    with span(f"bench.{phase}.search"):
+        with SearchIndex(work / ".booktool" / "search.sqlite3", root=work) as index:
+            index.update()
+        items["search"] = sections
+    with span(f"bench.{phase}.dedup"):
+        store = SignatureStore(work / ".booktool" / INDEX_NAME)
+        try:
+            find_duplicates([load_book(book_dir)], store=store)
+        finally:
+            store.close()
+        items["dedup"] = sections
+    with span(f"bench.{phase}.export"):
+        Exporter([load_book(book_dir)], ["docx", "pdf"], work / "dist").run(pool)
+        items["export"] = sections
+    return items
+
+
+def collect(records: list[dict], items: dict[str, dict[str, int]]) -> dict[str, dict]:
+    """Per-stage numbers from the captured ``bench.*`` spans, the fastest of any repeats."""
+    results: dict[str, dict] = {}
+    for record in records:
+        parts = record["name"].split(".")
+        if len(parts) != 3 or parts[0] != "bench":
+            continue
+        _, phase, stage = parts
+        count = items[phase][stage]
+        row = {
+            "seconds": record["duration"],
+            "items": count,
+            "per_second": count / record["duration"] if record["duration"] else 0.0,
+            "peak_rss": record.get("peak_rss", 0),
+            "children_peak_rss": record.get("children_peak_rss", 0),
+            "bytes_read": record.get("bytes_read", 0),
+            "bytes_written": record.get("bytes_written", 0),
+            "prompt_tokens": record.get("prompt_tokens", 0),
+            "completion_tokens": record.get("completion_tokens", 0),
+            "cached_tokens": record.get("cached_tokens", 0),
+        }
+        best = results.get(f"{phase}.{stage}")
+        if best is not None:
+            # Later repeats start from a bigger retained heap, so memory takes the lowest run.
+            for key in ("peak_rss", "children_peak_rss"):
+                row[key] = min(row[key], best[key])
+            if best["seconds"] <= row["seconds"]:
+                best.update({key: row[key] for key in ("peak_rss", "children_peak_rss")})
+                continue
+        results[f"{phase}.{stage}"] = row
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Stages that got slower or bigger than the baseline by more than ``tolerance``."""
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        slower = now["seconds"] - before["seconds"]
+        if slower > MIN_SECONDS and now["seconds"] > before["seconds"] * (1 + tolerance):
+            regressions.append(f"{name}: {before['seconds']:.2f} s -> {now['seconds']:.2f} s")
+        bigger = now["peak_rss"] - before["peak_rss"]
+        if bigger > MIN_RSS and now["peak_rss"] > before["peak_rss"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak {before['peak_rss'] / 2**20:.1f} MiB -> {now['peak_rss'] / 2**20:.1f} MiB"
+            )
+    return regressions
+
+
+def render_table(results: dict[str, dict]) -> str:
+    lines = [f"{'stage':<18} {'seconds':>8} {'items/s':>9} {'peak MiB':>9} {'tokens in':>10} {'tokens out':>10} {'cached':>8}"]
+    for name, r in results.items():
+        peak = max(r["peak_rss"], r["children_peak_rss"])
+        lines.append(
+            f"{name:<18} {r['seconds']:>8.3f} {r['per_second']:>9.1f} {peak / 2**20:>9.1f} "
+            f"{r['prompt_tokens']:>10} {r['completion_tokens']:>10} {r['cached_tokens']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("bench", help="run every stage on a synthetic book and report per-stage throughput")
+    parser.add_argument("--sections", type=int, default=200, help="sections in the synthetic book (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the corpus and the stub model")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest counts (default: 3)")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated model latency in seconds (default: 0)")
+    parser.add_argument("--workers", type=int, default=5, help="concurrent pipeline agents (default: 5)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--workdir", type=Path, help="build the corpus in this (empty) directory instead of a temporary one")
+    parser.add_argument("--keep", action="store_true", help="keep the corpus and its outputs afterwards")
+    parser.add_argument("--save", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare with results saved by --save")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed slowdown or growth against the baseline (default: 0.25)"
+    )
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    started = time.perf_counter()
+    if args.workdir and args.workdir.exists() and any(args.workdir.iterdir()):
+        print(f"{args.workdir} is not empty; the benchmark replaces its contents", file=sys.stderr)
+        return 1
+    work = args.workdir or Path(tempfile.mkdtemp(prefix="booktool-bench-"))
+    pool = ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker) if args.jobs > 1 else None
+    items: dict[str, dict[str, int]] = {}
+    try:
+        with capture() as records:
+            for _ in range(max(args.repeat, 1)):
+                shutil.rmtree(work, ignore_errors=True)
+                work.mkdir(parents=True)
+                book_dir = build_corpus(work, args.sections, args.seed)
+                items["cold"] = run_stages(work, book_dir, "cold", args, pool)
+                edited = edit_sections(book_dir, seed=args.seed)
+                items["warm"] = run_stages(work, book_dir, "warm", args, pool, edited)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+    results = collect(records, items)
+    print(render_table(results))
+    print(
+        f"{args.sections} sections, {len(edited)} edited before the warm pass, best of {max(args.repeat, 1)}; "
+        f"benchmark finished in {time.perf_counter() - started:.2f} s" + (f", corpus kept in {work}" if args.keep else ""),
+        file=sys.stderr,
+    )
+    if args.save:
+        args.save.write_text(
+            json.dumps({"sections": args.sections, "seed": args.seed, "stages": results}, indent=2), encoding="utf-8"
+        )
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("sections") != args.sections or baseline.get("seed") != args.seed:
+            print("baseline was recorded with different --sections/--seed; not comparing", file=sys.stderr)
+            return 1
+        regressions = compare(results, baseline["stages"], args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+    return 0
@@ -0,0 +1,184 @@
+"""Manuscript layout: books, parts and section files.
+
+A *book* is a directory holding a ``progress.json`` (for example
+``未出版/OpenClaw完全指南``). Each sub-directory of a book is a *part*
+(``第一部分``, ``序章``, ``第一章_认识Agent_Skill`` ...), and every Markdown
+file inside a part whose name starts with a section number is a *section*
+(``3.1_整体架构概览.md``, ``附录A_常用命令速查.md``, ``00_引言.md``).
+The merged ``<part>_完整.md`` files are build outputs, not sections.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+STATE_DIR = ".booktool"
+PART_SUFFIX = "_完整.md"
+FRONT_MATTER_DELIM = "---"
+
+_SECTION_NAME_RE = re.compile(r"^(?P<id>\d+(?:\.\d+)*|附录[A-Z])_(?P<title>.+)\.md$")
+_IGNORED_SUFFIXES = (PART_SUFFIX, "_research.md", "_draft.md", "_review.md")
+
+
+@dataclass(frozen=True)
+class Section:
+    book: "Book"
+    path: Path
+
+    @property
+    def rel(self) -> str:
+        """Path relative to the book root, the stable key used by every cache."""
+        return self.path.relative_to(self.book.root).as_posix()
+
+    @property
+    def part(self) -> str:
+        return self.path.parent.name
+
+    @property
+    def file_id(self) -> str:
+        return _SECTION_NAME_RE.match(self.path.name).group("id")
+
+    @property
+    def file_title(self) -> str:
+        return _SECTION_NAME_RE.match(self.path.name).group("title")
+
+    def sort_key(self) -> tuple:
+        return section_sort_key(self.file_id)
+
+
+@dataclass
+class Book:
+    root: Path
+    sections: list[Section] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return self.root.name
+
+    @property
+    def state_dir(self) -> Path:
+        return self.root / STATE_DIR
+
+    @property
+    def progress_path(self) -> Path:
+        return self.root / "progress.json"
+
+    def parts(self) -> dict[str, list[Section]]:
+        """Sections grouped by part directory, each group in reading order."""
+        grouped: dict[str, list[Section]] = {}
+        for section in self.sections:
+            grouped.setdefault(section.part, []).append(section)
+        return grouped
+
+    def part_output(self, part: str) -> Path:
+        return self.root / part / f"{part}{PART_SUFFIX}"
+
+
+def section_sort_key(section_id: str) -> tuple:
+    """Order ``0.1 < 1.2 < 1.10 < 附录A``; plain string compare gets 1.10 wrong."""
+    if section_id.startswith("附录"):
+        return (1, (), section_id)
+    return (0, tuple(int(n) for n in section_id.split(".")), "")
+
+
+_CN_DIGITS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_PART_NUMBER_RE = re.compile(r"^第([一二三四五六七八九十]+)(?:部分|章)")
+_FRONT_PARTS = ("序章", "引言", "前言")
+
+
+def _cn_number(text: str) -> int:
+    if "十" not in text:
+        return _CN_DIGITS[text]
+    tens, _, ones = text.partition("十")
+    return (_CN_DIGITS[tens] if tens else 1) * 10 + (_CN_DIGITS[ones] if ones else 0)
+
+
+def part_sort_key(name: str) -> tuple:
+    """Reading order of part directories: 序章/引言, 第一…第N部分, 终章, 附录."""
+    if name.startswith(_FRONT_PARTS):
+        return (0, 0, name)
+    match = _PART_NUMBER_RE.match(name)
+    if match:
+        return (1, _cn_number(match.group(1)), name)
+    if name.startswith("终章"):
+        return (2, 0, name)
+    if name.startswith("附录"):
+        return (4, 0, name)
+    return (3, 0, name)
+
+
+def is_section_file(path: Path) -> bool:
+    if path.suffix != ".md" or path.name.endswith(_IGNORED_SUFFIXES):
+        return False
+    return _SECTION_NAME_RE.match(path.name) is not None
+
+
+def load_book(root: Path) -> Book:
+    book = Book(root=root.resolve())
+    part_dirs = [p for p in book.root.iterdir() if p.is_dir() and not p.name.startswith(".")]
+    for part_dir in sorted(part_dirs, key=lambda p: part_sort_key(p.name)):
+        found = [Section(book, p) for p in part_dir.iterdir() if p.is_file() and is_section_file(p)]
+        book.sections.extend(sorted(found, key=Section.sort_key))
+    return book
+
+
+def find_books(root: Path = REPO_ROOT) -> list[Book]:
+    """Every book under ``root``, found by its ``progress.json``."""
+    roots = sorted(p.parent for p in root.glob("*/*/progress.json"))
+    roots += sorted(p.parent for p in root.glob("*/progress.json"))
+    return [load_book(r) for r in roots]
+
+
+def resolve_books(paths: list[str] | None) -> list[Book]:
+    """Books named on the command line, or every book in the repository."""
+    if not paths:
+        return find_books()
+    return [load_book(Path(p)) for p in paths]
+
+
+def split_front_matter(text: str) -> tuple[str, str]:
+    """Return ``(front_matter, body)``; front matter excludes its delimiters."""
+    if not text.startswith(FRONT_MATTER_DELIM + "\n"):
+        return "", text
+    end = text.find("\n" + FRONT_MATTER_DELIM + "\n", len(FRONT_MATTER_DELIM))
+    if end < 0:
+        return "", text
+    return text[len(FRONT_MATTER_DELIM) + 1 : end], text[end + len(FRONT_MATTER_DELIM) + 2 :]
+
+
+def parse_front_matter_lines(lines: Iterator[str] | list[str]) -> dict[str, object]:
+    """Parse the flat ``key: value`` front matter the manuscripts use.
+
+    Values are unquoted and integers are converted; nothing nested appears in
+    these files, so a YAML parser is not needed here.
+    """
+    meta: dict[str, object] = {}
+    for line in lines:
+        key, sep, value = line.partition(":")
+        if not sep or not key.strip() or line[:1].isspace():
+            continue
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        elif re.fullmatch(r"-?\d+", value):
+            meta[key.strip()] = int(value)
+            continue
+        meta[key.strip()] = value
+    return meta
+
+
+def update_front_matter(text: str, updates: dict[str, object]) -> str:
+    """Set keys in a section's front matter, keeping every other line as is."""
+    front, body = split_front_matter(text)
+    lines = front.split("\n") if front else []
+    pending = dict(updates)
+    for i, line in enumerate(lines):
+        key = line.partition(":")[0].strip()
+        if key in pending and not line[:1].isspace():
+            lines[i] = f"{key}: {pending.pop(key)}"
+    lines.extend(f"{key}: {value}" for key, value in pending.items())
+    return "\n".join([FRONT_MATTER_DELIM, *lines, FRONT_MATTER_DELIM, ""]) + body
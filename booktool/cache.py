@@ -0,0 +1,223 @@
+"""Disk-backed cache of model responses.
+
+Entries are keyed by a hash of the model name, the options the model was
+built with (``--model stub:words=30``), the call parameters, the
+normalized prompt and the outline fragment the prompt was built from, so
+re-running the pipeline over unchanged sections costs no model calls. The
+cache lives in ``.booktool/llm-cache.sqlite3`` (SQLite is in the standard
+library and gives cheap atomic updates from several worker threads). It is
+bounded by total response size and evicts least-recently-used entries; hit,
+miss and eviction counters persist across runs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from .llm import Completion, Model
+from .trace import count
+
+CACHE_NAME = "llm-cache.sqlite3"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Evict down to this fraction of the budget so a full cache does not evict on every put.
+_EVICT_TO = 0.9
+_BLANK_RUN_RE = re.compile(r"\n{3,}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    section TEXT NOT NULL,
+    section_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used);
+CREATE INDEX IF NOT EXISTS entries_section ON entries(section);
+CREATE INDEX IF NOT EXISTS entries_section_id ON entries(section_id);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """NFC, no trailing spaces, at most one blank line in a row, no outer whitespace."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n")
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_RUN_RE.sub("\n\n", text).strip()
+
+
+def cache_key(
+    model: str, prompt: str, params: dict | None = None, outline: str = "", options: dict | None = None
+) -> str:
+    data = {"model": model, "params": params or {}, "prompt": normalize_text(prompt), "outline": normalize_text(outline)}
+    if options:
+        # Left out when empty so keys written before options were recorded stay valid.
+        data["options"] = options
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _bump(self, name: str, by: int = 1) -> None:
+        self._db.execute(
+            "INSERT INTO counters(name, value) VALUES(?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, by),
+        )
+
+    def get(self, key: str) -> Completion | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text, prompt_tokens, completion_tokens FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._bump("misses")
+                return None
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._bump("hits")
+            self._bump("tokens_saved", row[1] + row[2])
+            return Completion(text=row[0], prompt_tokens=row[1], completion_tokens=row[2])
+
+    def put(self, key: str, completion: Completion, section: str = "", section_id: str = "") -> None:
+        size = len(completion.text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, section, section_id, completion.text, completion.prompt_tokens,
+                 completion.completion_tokens, size, now, now),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * _EVICT_TO)
+        evicted = 0
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._bump("evictions", evicted)
+
+    def complete(
+        self,
+        model: Model,
+        prompt: str,
+        params: dict | None = None,
+        outline: str = "",
+        section: str = "",
+        section_id: str = "",
+        options: dict | None = None,
+    ) -> Completion:
+        """Return the cached response for this call, asking ``model`` on a miss.
+
+        ``options`` describe how ``model`` was built (see :func:`booktool.llm.parse_spec`);
+        they only go into the key, unlike ``params``, which are passed to the call.
+        """
+        key = cache_key(model.name, prompt, params, outline, options)
+        hit = self.get(key)
+        if hit is not None:
+            count(cached_tokens=hit.prompt_tokens + hit.completion_tokens)
+            return hit
+        completion = model.complete(prompt, **(params or {}))
+        count(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+        self.put(key, completion, section, section_id)
+        return completion
+
+    def invalidate(self, sections: list[str]) -> int:
+        """Drop every entry recorded for the given section paths or ids."""
+        removed = 0
+        with self._lock:
+            for section in sections:
+                cur = self._db.execute("DELETE FROM entries WHERE section = ? OR section_id = ?", (section, section))
+                removed += cur.rowcount
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._db.execute("DELETE FROM entries").rowcount
+            self._db.execute("DELETE FROM counters")
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+        stats = {"entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+        for name in ("hits", "misses", "evictions", "tokens_saved"):
+            stats[name] = counters.get(name, 0)
+        return stats
+
+
+def open_cache(book, max_bytes: int = DEFAULT_MAX_BYTES) -> ResponseCache:
+    return ResponseCache(book.state_dir / CACHE_NAME, max_bytes)
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("cache", help="inspect or invalidate the model response cache")
+    actions = parser.add_subparsers(dest="action", required=True)
+    stats = actions.add_parser("stats", help="show entry count, size and hit/miss counters")
+    stats.add_argument("books", nargs="*", help="book directories (default: every book in the repo)")
+    invalidate = actions.add_parser("invalidate", help="drop cached responses for some sections")
+    invalidate.add_argument("book", help="book directory")
+    invalidate.add_argument("sections", nargs="+", help="section ids (1.1) or paths (第一部分/1.1_创始人的退休项目.md)")
+    clear = actions.add_parser("clear", help="drop every cached response and reset counters")
+    clear.add_argument("books", nargs="*", help="book directories (default: every book in the repo)")
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    from .book import load_book, resolve_books
+
+    if args.action == "invalidate":
+        with open_cache(load_book(Path(args.book))) as cache:
+            print(f"{cache.invalidate(args.sections)} entr(ies) removed")
+        return 0
+    for book in resolve_books(args.books):
+        with open_cache(book) as cache:
+            if args.action == "clear":
+                print(f"{book.name}: {cache.clear()} entr(ies) removed")
+                continue
+            s = cache.stats()
+            lookups = s["hits"] + s["misses"]
+            rate = f"{s['hits'] / lookups:.0%}" if lookups else "n/a"
+            print(
+                f"{book.name}: {s['entries']} entries, {s['bytes'] / 1024:.1f} KiB of "
+                f"{s['max_bytes'] / 1024 / 1024:.0f} MiB; {s['hits']} hits, {s['misses']} misses "
+                f"({rate}), {s['evictions']} evicted, {s['tokens_saved']} tokens saved"
+            )
+    return 0
@@ -0,0 +1,51 @@
+"""Command line entry point: ``python -m booktool <stage> ...``."""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import sys
+
+from .trace import span
+
+# Stage modules, in pipeline order. Each one exposes ``register(subparsers)``.
+STAGES = [
+    "booktool.assemble",
+    "booktool.progress",
+    "booktool.pipeline",
+    "booktool.cache",
+    "booktool.search",
+    "booktool.validate",
+    "booktool.dedup",
+    "booktool.export",
+    "booktool.coverage",
+    "booktool.trace",
+    "booktool.bench",
+]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="booktool", description="Build tooling for the manuscripts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in STAGES:
+        importlib.import_module(name).register(subparsers)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "trace":
+            return args.func(args)
+        with span(args.command, argv=" ".join(sys.argv[1:] if argv is None else argv)):
+            return args.func(args)
+    except BrokenPipeError:
+        # The reader went away (``booktool search ... | head``). Point stdout at
+        # devnull so the interpreter's final flush does not raise again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""Outline-vs-manuscript diff: coverage and word budgets per outline node.
+
+Each section is mapped to its outline node (see :mod:`booktool.outline`).
+A node's *key points* are its bullets and table rows (or its sentences when
+it has none); a point counts as covered when at least half of its terms —
+Latin words and CJK bigrams, as in :mod:`booktool.search` — occur in the
+mapped section. Word counts come from :class:`booktool.stats.StatsIndex`,
+and the covered flags are cached in ``.booktool/coverage.json`` keyed by the
+section's ``(size, mtime_ns)`` and a hash of the node text, so after an edit
+only the edited section is read again and the dashboard redraws at once. The
+section-to-node matches are cached there too, keyed by the section title and
+a hash of the outline, so only renamed sections are matched again until the
+outline itself changes.
+
+Budgets are the node's planned length from the outline. A section whose
+title matches no node is mapped to the ``第N章`` node of its number; sections
+the outline does not mention at all and outline leaves no section covers are
+listed separately. Unmatched sections still count towards the words of their
+part's node (see :meth:`booktool.outline.Outline.node_for_part`), so the
+totals add up to the manuscript.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+
+from .book import Book, Section, resolve_books, split_front_matter
+from .fsutil import atomic_write_json, load_json, sha1_bytes, stat_key
+from .outline import Outline, OutlineNode, find_outline
+from .search import tokenize
+from .stats import SectionStats, StatsIndex
+
+CACHE_NAME = "coverage.json"
+CACHE_VERSION = 3
+POINT_THRESHOLD = 0.5
+
+
+def point_covered(point: str, terms: set[str], threshold: float = POINT_THRESHOLD) -> bool:
+    tokens = tokenize(point)
+    return bool(tokens) and len(tokens & terms) / len(tokens) >= threshold
+
+
+@dataclass
+class SectionCoverage:
+    section: Section
+    stats: SectionStats
+    node: OutlineNode | None
+    covered: list[bool] = field(default_factory=list)
+    # Where the words roll up: ``node``, else the node of the part directory.
+    parent: OutlineNode | None = None
+
+    @property
+    def words(self) -> int:
+        return self.stats.words
+
+    @property
+    def target(self) -> int:
+        value = self.stats.meta.get("target_words")
+        return value if isinstance(value, int) else 0
+
+
+@dataclass
+class NodeRow:
+    node: OutlineNode
+    depth: int
+    sections: list[SectionCoverage]
+    words: int = 0
+    target: int = 0
+    points: int = 0
+    covered: int = 0
+
+    @property
+    def delta(self) -> int | None:
+        return None if self.node.planned is None else self.words - self.node.planned
+
+
+@dataclass
+class CoverageReport:
+    book: Book
+    outline: Outline
+    rows: list[NodeRow]
+    sections: list[SectionCoverage]
+    unmatched: list[SectionCoverage]
+    missing: list[OutlineNode]
+    rescanned: int = 0
+    recomputed: int = 0
+
+    @property
+    def words(self) -> int:
+        return sum(s.words for s in self.sections)
+
+    @property
+    def planned(self) -> int | None:
+        budgets = [root.planned for root in self.outline.roots if root.planned is not None]
+        return sum(budgets) if budgets else None
+
+    @property
+    def target(self) -> int:
+        return sum(s.target for s in self.sections)
+
+
+class CoverageIndex:
+    """Maps one book's sections onto its outline, reusing cached coverage."""
+
+    def __init__(self, book: Book):
+        self.book = book
+        self.outline = Outline(book)
+        self.stats = StatsIndex(book)
+        self.cache_path = book.state_dir / CACHE_NAME
+        data = load_json(self.cache_path, {})
+        self.cache: dict[str, dict] = data.get("sections", {}) if data.get("version") == CACHE_VERSION else {}
+        # Cached matches were made against this outline; any edit to it voids them.
+        self.outline_changed = data.get("outline") != self.outline.digest
+
+    def _node_for(self, section: Section, title: str) -> tuple[OutlineNode | None, bool]:
+        entry = self.cache.get(section.rel)
+        if entry and not self.outline_changed and entry.get("title") == title:
+            return (None if entry["match"] is None else self.outline.node_at(entry["match"])), False
+        node = self.outline.node_for(section, title)
+        self.cache[section.rel] = {**(entry or {}), "title": title, "match": node.line if node else None}
+        return node, True
+
+    def _covered(self, section: Section, stats: SectionStats, node: OutlineNode) -> tuple[list[bool], bool]:
+        node_hash = sha1_bytes(node.fragment.encode("utf-8"))
+        entry = self.cache[section.rel]
+        if entry.get("stat") == list(stats.stat) and entry.get("node") == node_hash:
+            return entry["covered"], False
+        _, body = split_front_matter(section.path.read_text(encoding="utf-8"))
+        terms = tokenize(body)
+        covered = [point_covered(point, terms) for point in node.key_points()]
+        entry.update(stat=list(stats.stat), node=node_hash, covered=covered)
+        return covered, True
+
+    def report(self) -> CoverageReport:
+        stats = self.stats.refresh()
+        sections, recomputed, rematched = [], 0, 0
+        for section in self.book.sections:
+            st = stats[section.rel]
+            title = st.meta.get("title")
+            node, fresh = self._node_for(section, title if isinstance(title, str) else section.file_title)
+            rematched += fresh
+            coverage = SectionCoverage(section, st, node, parent=node or self.outline.node_for_part(section.part))
+            if node is not None:
+                coverage.covered, fresh = self._covered(section, st, node)
+                recomputed += fresh
+            sections.append(coverage)
+        live = {s.section.rel for s in sections}
+        if recomputed or rematched or set(self.cache) - live or not self.cache_path.exists():
+            self.cache = {rel: entry for rel, entry in self.cache.items() if rel in live}
+            atomic_write_json(
+                self.cache_path, {"version": CACHE_VERSION, "outline": self.outline.digest, "sections": self.cache}
+            )
+
+        by_node: dict[int, list[SectionCoverage]] = {}
+        for coverage in sections:
+            if coverage.parent is not None:
+                by_node.setdefault(id(coverage.parent), []).append(coverage)
+        rows: list[NodeRow] = []
+        missing: list[OutlineNode] = []
+
+        def visit(node: OutlineNode, depth: int) -> NodeRow:
+            row = NodeRow(node, depth, by_node.get(id(node), []))
+            rows.append(row)
+            for coverage in row.sections:
+                row.words += coverage.words
+                row.target += coverage.target
+                row.points += len(coverage.covered)
+                row.covered += sum(coverage.covered)
+            for child in node.children:
+                sub = visit(child, depth + 1)
+                row.words += sub.words
+                row.target += sub.target
+                row.points += sub.points
+                row.covered += sub.covered
+            if not node.children and node.number and not row.sections:
+                missing.append(node)
+            return row
+
+        for root in self.outline.roots:
+            visit(root, 0)
+        unmatched = [s for s in sections if s.node is None]
+        return CoverageReport(
+            self.book, self.outline, rows, sections, unmatched, missing, len(self.stats.rescanned), recomputed
+        )
+
+
+def _fmt(value: int | None, signed: bool = False) -> str:
+    if value is None:
+        return "-"
+    return f"{value:+,}" if signed else f"{value:,}"
+
+
+def _ratio(part: int, whole: int) -> str:
+    return f"{part}/{whole}" if whole else "-"
+
+
+def render_dashboard(report: CoverageReport, max_depth: int | None = None, sections: bool = True) -> str:
+    planned = report.planned
+    share = f" ({report.words / planned:.0%})" if planned else ""
+    points = sum(r.points for r in report.rows if r.depth == 0)
+    covered = sum(r.covered for r in report.rows if r.depth == 0)
+    lines = [
+        f"{report.book.name}: {report.words:,} / {_fmt(planned)} 字{share}, target {report.target:,}; "
+        f"{len(report.sections)} sections, key points covered {_ratio(covered, points)}",
+        f"{'plan':>8} {'words':>8} {'delta':>8} {'cover':>7}  outline",
+    ]
+    for row in report.rows:
+        if max_depth is not None and row.depth > max_depth:
+            continue
+        indent = "  " * row.depth
+        lines.append(
+            f"{_fmt(row.node.planned):>8} {_fmt(row.words):>8} {_fmt(row.delta, True):>8} "
+            f"{_ratio(row.covered, row.points):>7}  {indent}{row.node.label}"
+        )
+        if sections:
+            for s in row.sections:
+                lines.append(
+                    f"{'':>8} {_fmt(s.words):>8} {'':>8} {_ratio(sum(s.covered), len(s.covered)):>7}  "
+                    f"{indent}  ↳ {s.section.rel} [{s.stats.meta.get('status', '?')}]"
+                )
+    if report.unmatched:
+        lines.append(f"not in the outline ({len(report.unmatched)}):")
+        lines += [f"{'':>8} {_fmt(s.words):>8}  {s.section.rel}" for s in report.unmatched]
+    if report.missing:
+        lines.append(f"outline entries with no section ({len(report.missing)}):")
+        lines += [f"{_fmt(n.planned):>8} {'':>8}  {n.label}" for n in report.missing]
+    return "\n".join(lines)
+
+
+def report_json(report: CoverageReport) -> dict:
+    return {
+        "book": report.book.name,
+        "outline": report.outline.path.name if report.outline.path else None,
+        "words": report.words,
+        "planned": report.planned,
+        "target": report.target,
+        "nodes": [
+            {
+                "line": row.node.line,
+                "depth": row.depth,
+                "label": row.node.label,
+                "planned": row.node.planned,
+                "words": row.words,
+                "delta": row.delta,
+                "points": row.points,
+                "covered": row.covered,
+                "sections": [s.section.rel for s in row.sections],
+            }
+            for row in report.rows
+        ],
+        "unmatched": [s.section.rel for s in report.unmatched],
+        "missing": [n.label for n in report.missing],
+    }
+
+
+def _fingerprint(books: list[Book]) -> tuple:
+    """Stat keys of every section and outline, to poll for edits cheaply."""
+    paths = []
+    for book in books:
+        paths += [s.path for s in book.sections]
+        outline = find_outline(book)
+        if outline:
+            paths.append(outline)
+    return tuple((str(p), stat_key(p)) for p in paths)
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("coverage", help="compare the manuscript with its outline: coverage and budgets")
+    parser.add_argument("books", nargs="*", help="book directories (default: every book in the repo)")
+    parser.add_argument("--depth", type=int, help="only show outline nodes down to this depth")
+    parser.add_argument("--no-sections", action="store_true", help="hide the section lines under each node")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="redraw whenever a section or outline changes")
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    while True:
+        started = time.perf_counter()
+        books = resolve_books(args.books)
+        reports = [CoverageIndex(book).report() for book in books]
+        if args.json:
+            json.dump([report_json(r) for r in reports], sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        else:
+            if args.watch:
+                print("\x1b[2J\x1b[H", end="")
+            print("\n\n".join(render_dashboard(r, args.depth, not args.no_sections) for r in reports))
+        rescanned = sum(r.rescanned for r in reports)
+        recomputed = sum(r.recomputed for r in reports)
+        print(
+            f"{rescanned} section(s) re-scanned, {recomputed} coverage recomputed "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms",
+            file=sys.stderr,
+        )
+        if not args.watch:
+            return 0
+        fingerprint = _fingerprint(books)
+        try:
+            while _fingerprint(resolve_books(args.books)) == fingerprint:
+                time.sleep(args.watch)
+        except KeyboardInterrupt:
+            return 0
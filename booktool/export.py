@@ -0,0 +1,222 @@
+"""Export whole books from section Markdown to DOCX and PDF.
+
+Every section is rendered on its own into a format-specific fragment (a
+``<w:body>`` XML fragment for DOCX, laid-out page streams for PDF) by a pool
+of worker processes. Each worker builds its renderers once, in the pool
+initializer, so styles and font metrics are shared by every section it
+renders. Fragments are cached under ``.booktool/export/<format>/`` by a hash
+of the section text, the format and :data:`RENDER_VERSION`, so a re-export
+only renders the chapters that changed.
+
+The final merge streams the cached fragments into the output file one at a
+time (one page at a time for PDF) and workers hand back only sizes, never
+rendered content, so peak memory is bounded by the largest single section
+rather than the size of the book. ``.booktool/export.json`` records the
+fragments each output was built from; an output whose fragments are all
+unchanged is not rewritten.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from .assemble import part_header
+from .book import REPO_ROOT, Book, parse_front_matter_lines, resolve_books, split_front_matter
+from .docx import DocxRenderer, write_docx
+from .fsutil import atomic_write_bytes, atomic_write_json, load_json, sha1_bytes, stat_key
+from .markdown import Block, parse_blocks
+from .pdf import PdfRenderer, write_pdf
+from .trace import span
+
+# Bump when renderer output changes so cached fragments are rebuilt.
+RENDER_VERSION = 1
+MANIFEST_NAME = "export.json"
+CACHE_DIR = "export"
+DEFAULT_OUTPUT = REPO_ROOT / "dist"
+RENDERERS = {"docx": DocxRenderer, "pdf": PdfRenderer}
+WRITERS = {"docx": write_docx, "pdf": write_pdf}
+
+# Per-process renderers, built once by the pool initializer (or lazily in-process).
+_renderers: dict[str, object] = {}
+
+
+def _init_worker() -> None:
+    for fmt, renderer in RENDERERS.items():
+        _renderers[fmt] = renderer()
+
+
+def _renderer(fmt: str):
+    if fmt not in _renderers:
+        _renderers[fmt] = RENDERERS[fmt]()
+    return _renderers[fmt]
+
+
+def section_blocks(text: str, fallback_title: str) -> list[Block]:
+    """Blocks of a section body; sections without a leading heading get one from the front matter."""
+    front, body = split_front_matter(text)
+    blocks = parse_blocks(body)
+    if not blocks or blocks[0].kind != "heading":
+        meta = parse_front_matter_lines(front.split("\n")) if front else {}
+        blocks.insert(0, Block("heading", str(meta.get("title") or fallback_title), 1))
+    return blocks
+
+
+def _render(task: tuple[str, str, str, str]) -> int:
+    """Render one section to its cache file; runs in a worker. Returns the fragment size."""
+    fmt, path, title, output = task
+    with open(path, "r", encoding="utf-8") as fh:
+        blocks = section_blocks(fh.read(), title)
+    data = _renderer(fmt).render(blocks)
+    atomic_write_bytes(Path(output), data)
+    return len(data)
+
+
+@dataclass
+class ExportReport:
+    book: str
+    fmt: str
+    output: Path
+    sections: int = 0
+    rendered: int = 0
+    written: bool = False
+    size: int = 0
+    pages: int | None = None
+
+
+@dataclass
+class _Job:
+    book: Book
+    fmt: str
+    output: Path
+    # Fragments in reading order: part titles are strings, sections ``(section, cache_path)``.
+    items: list
+    keys: list[str]
+    report: ExportReport
+
+
+class Exporter:
+    def __init__(self, books: list[Book], formats: list[str], output_dir: Path = DEFAULT_OUTPUT, force: bool = False):
+        self.books = books
+        self.formats = formats
+        self.output_dir = output_dir
+        self.force = force
+
+    def _plan(self, book: Book) -> tuple[list[_Job], dict[str, tuple]]:
+        digests = {}
+        for section in book.sections:
+            digests[section.rel] = sha1_bytes(section.path.read_bytes())
+        jobs, todo = [], {}
+        for fmt in self.formats:
+            cache_dir = book.state_dir / CACHE_DIR / fmt
+            suffix = RENDERERS[fmt].suffix
+            items, keys = [], []
+            for part, sections in book.parts().items():
+                title = part_header(book, part).decode("utf-8")[2:].replace("_", " ")
+                items.append(title)
+                keys.append(f"part:{title}")
+                for section in sections:
+                    key = sha1_bytes(f"{RENDER_VERSION}\0{fmt}\0{digests[section.rel]}".encode("utf-8"))
+                    cache_path = cache_dir / f"{key}{suffix}"
+                    items.append((section, cache_path))
+                    keys.append(key)
+                    if self.force or not cache_path.exists():
+                        todo[str(cache_path)] = (fmt, str(section.path), section.file_title, str(cache_path))
+            output = self.output_dir / f"{book.name}.{fmt}"
+            report = ExportReport(book.name, fmt, output, sections=len(book.sections))
+            report.rendered = sum(1 for item in items if not isinstance(item, str) and str(item[1]) in todo)
+            jobs.append(_Job(book, fmt, output, items, keys, report))
+        return jobs, todo
+
+    def run(self, pool: ProcessPoolExecutor | None = None) -> list[ExportReport]:
+        planned: list[tuple[Book, dict, list[_Job]]] = []
+        todo: dict[str, tuple] = {}
+        for book in self.books:
+            manifest = load_json(book.state_dir / MANIFEST_NAME, {})
+            if manifest.get("version") != RENDER_VERSION:
+                manifest = {}
+            jobs, book_todo = self._plan(book)
+            planned.append((book, manifest, jobs))
+            todo.update(book_todo)
+
+        # Render every stale fragment of every book in one pass over the pool.
+        tasks = list(todo.values())
+        with span("export.render", fragments=len(tasks)):
+            for _ in pool.map(_render, tasks) if pool else map(_render, tasks):
+                pass
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        reports = []
+        for book, manifest, jobs in planned:
+            outputs = manifest.setdefault("outputs", {})
+            for job in jobs:
+                with span("export.merge", book=book.name, format=job.fmt):
+                    self._merge(job, outputs)
+                reports.append(job.report)
+            manifest["version"] = RENDER_VERSION
+            atomic_write_json(book.state_dir / MANIFEST_NAME, manifest)
+            self._prune(book, jobs)
+        return reports
+
+    def _merge(self, job: _Job, outputs: dict) -> None:
+        record = outputs.get(job.fmt, {})
+        out = str(job.output)
+        unchanged = (
+            not self.force
+            and record.get("output") == out
+            and record.get("fragments") == job.keys
+            and job.output.exists()
+            and record.get("stat") == list(stat_key(job.output))
+        )
+        if not unchanged:
+            renderer = _renderer(job.fmt)
+            fragments = (renderer.part(item) if isinstance(item, str) else item[1] for item in job.items)
+            pages = WRITERS[job.fmt](job.output, job.book.name, fragments)
+            record = {"output": out, "fragments": job.keys, "stat": list(stat_key(job.output)), "pages": pages}
+            outputs[job.fmt] = record
+            job.report.written = True
+        job.report.size = job.output.stat().st_size
+        job.report.pages = record.get("pages")
+
+    def _prune(self, book: Book, jobs: list[_Job]) -> None:
+        live = {str(item[1]) for job in jobs for item in job.items if not isinstance(item, str)}
+        for fmt in self.formats:
+            cache_dir = book.state_dir / CACHE_DIR / fmt
+            if cache_dir.is_dir():
+                for path in cache_dir.iterdir():
+                    if str(path) not in live:
+                        path.unlink()
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("export", help="export books to DOCX and PDF")
+    parser.add_argument("books", nargs="*", help="book directories (default: every book in the repo)")
+    parser.add_argument(
+        "--format", dest="formats", nargs="+", choices=sorted(RENDERERS), default=sorted(RENDERERS),
+        help="output formats (default: docx pdf)",
+    )
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="output directory (default: dist/)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render every section and rewrite every output")
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    started = time.perf_counter()
+    books = resolve_books(args.books)
+    pool = ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker) if args.jobs > 1 else None
+    try:
+        reports = Exporter(books, args.formats, args.output, args.force).run(pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    for r in reports:
+        state = "wrote" if r.written else "unchanged"
+        pages = f", {r.pages} pages" if r.pages else ""
+        print(f"{state} {r.output} ({r.size / 1024:.0f} KiB{pages}); {r.rendered}/{r.sections} section(s) rendered")
+    print(f"exported {len(reports)} file(s) in {time.perf_counter() - started:.2f} s", file=sys.stderr)
+    return 0
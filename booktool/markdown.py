@@ -0,0 +1,172 @@
+"""A small Markdown reader for the subset the manuscripts use.
+
+Sections are parsed into a flat list of blocks: headings, paragraphs, fenced
+code, block quotes, list items (nesting is kept as a depth, not as a tree),
+pipe tables and rules. Inline text becomes spans carrying bold, italic and
+code flags; links keep their text and images their alt text. That is all the
+exporters need, and it keeps them free of a Markdown dependency.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+_FENCE_RE = re.compile(r"^(\s*)(`{3,}|~{3,})\s*([\w+#.-]*)")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_RULE_RE = re.compile(r"^\s*(?:(?:\*\s*){3,}|(?:-\s*){3,}|(?:_\s*){3,})$")
+_ITEM_RE = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+_QUOTE_RE = re.compile(r"^\s*>\s?(.*)$")
+_TABLE_SEP_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$")
+_INLINE_RE = re.compile(
+    r"(?P<code>`+)(?P<code_text>.+?)(?P=code)"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|(?<![\w*])\*(?!\s)(?P<italic>[^*]+?)\*(?!\*)"
+    r"|!\[(?P<alt>[^\]]*)\]\([^)]*\)"
+    r"|\[(?P<link>[^\]]+)\]\([^)]*\)"
+    r"|<(?P<url>https?://[^>\s]+)>"
+    r"|\\(?P<escaped>[\\`*_\[\]#<>|])"
+)
+_CJK_RE = re.compile(r"[⺀-鿿豈-﫿＀-￯　-〿]")
+
+
+@dataclass(frozen=True)
+class Span:
+    text: str
+    bold: bool = False
+    italic: bool = False
+    code: bool = False
+
+
+@dataclass
+class Block:
+    kind: str  # heading, paragraph, code, quote, item, table, rule
+    text: str = ""
+    level: int = 0  # heading level, or list depth for items
+    marker: str = ""  # "•" or "1." for list items; the fence language for code
+    rows: list[list[str]] = field(default_factory=list)
+
+    @property
+    def spans(self) -> list[Span]:
+        return parse_inline(self.text)
+
+
+def parse_inline(text: str, bold: bool = False, italic: bool = False) -> list[Span]:
+    spans: list[Span] = []
+    pos = 0
+    for match in _INLINE_RE.finditer(text):
+        if match.start() > pos:
+            spans.append(Span(text[pos : match.start()], bold, italic))
+        pos = match.end()
+        if match.group("code"):
+            spans.append(Span(match.group("code_text").strip(), bold, italic, True))
+        elif match.group("bold") is not None:
+            spans.extend(parse_inline(match.group("bold"), True, italic))
+        elif match.group("italic") is not None:
+            spans.extend(parse_inline(match.group("italic"), bold, True))
+        elif match.group("alt") is not None:
+            spans.append(Span(f"[{match.group('alt') or 'image'}]", bold, italic))
+        elif match.group("link") is not None:
+            spans.extend(parse_inline(match.group("link"), bold, italic))
+        else:
+            spans.append(Span(match.group("url") or match.group("escaped"), bold, italic))
+    if pos < len(text):
+        spans.append(Span(text[pos:], bold, italic))
+    return [s for s in spans if s.text]
+
+
+def join_lines(lines: list[str]) -> str:
+    """Join soft-wrapped lines: no space between CJK characters, one otherwise."""
+    out = ""
+    for line in (l.strip() for l in lines):
+        if out and line and not (_CJK_RE.match(out[-1]) and _CJK_RE.match(line[0])):
+            out += " "
+        out += line
+    return out
+
+
+def split_row(line: str) -> list[str]:
+    cells = re.split(r"(?<!\\)\|", line.strip().strip("|"))
+    return [cell.strip().replace("\\|", "|") for cell in cells]
+
+
+def parse_blocks(text: str) -> list[Block]:
+    lines = text.split("\n")
+    blocks: list[Block] = []
+    paragraph: list[str] = []
+    indents: list[int] = []  # open list indents, innermost last
+
+    def flush() -> None:
+        if paragraph:
+            blocks.append(Block("paragraph", join_lines(paragraph)))
+            paragraph.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        fence = _FENCE_RE.match(line)
+        if fence:
+            flush()
+            opener, body = fence.group(2), []
+            i += 1
+            while i < len(lines):
+                close = _FENCE_RE.match(lines[i])
+                if close and close.group(2)[0] == opener[0] and len(close.group(2)) >= len(opener) and not close.group(3):
+                    break
+                body.append(lines[i])
+                i += 1
+            blocks.append(Block("code", "\n".join(body), marker=fence.group(3).lower()))
+            i += 1
+            continue
+        if not line.strip():
+            flush()
+            i += 1
+            continue
+        heading = _HEADING_RE.match(line)
+        item = _ITEM_RE.match(line)
+        if heading:
+            flush()
+            indents.clear()
+            blocks.append(Block("heading", heading.group(2), len(heading.group(1))))
+        elif _RULE_RE.match(line):
+            flush()
+            blocks.append(Block("rule"))
+        elif line.lstrip().startswith("|") and i + 1 < len(lines) and _TABLE_SEP_RE.match(lines[i + 1]):
+            flush()
+            rows = [split_row(line)]
+            i += 2
+            while i < len(lines) and lines[i].lstrip().startswith("|"):
+                rows.append(split_row(lines[i]))
+                i += 1
+            blocks.append(Block("table", rows=rows))
+            continue
+        elif _QUOTE_RE.match(line):
+            flush()
+            quoted = []
+            while i < len(lines) and _QUOTE_RE.match(lines[i]):
+                quoted.append(_QUOTE_RE.match(lines[i]).group(1))
+                i += 1
+            blocks.append(Block("quote", join_lines(quoted)))
+            continue
+        elif item:
+            flush()
+            indent = len(item.group(1).expandtabs(4))
+            while indents and indents[-1] > indent:
+                indents.pop()
+            if not indents or indents[-1] < indent:
+                indents.append(indent)
+            marker = "•" if item.group(2) in "-*+" else item.group(2).rstrip(")").rstrip(".") + "."
+            blocks.append(Block("item", item.group(3), len(indents) - 1, marker))
+        elif indents and blocks and blocks[-1].kind == "item" and not paragraph and line[:1].isspace():
+            blocks[-1].text = join_lines([blocks[-1].text, line])
+        else:
+            if not line[:1].isspace():
+                indents.clear()
+            paragraph.append(line)
+        i += 1
+    flush()
+    return blocks
+
+
+def plain_text(spans: list[Span]) -> str:
+    return "".join(span.text for span in spans)
@@ -0,0 +1,280 @@
+"""Book outlines (``*大纲.md`` / ``*纲要.md``) and how sections map onto them.
+
+An outline is read as a flat list of nodes: every Markdown heading outside
+fenced code, plus the ``**1.1 标题**`` bold lines the OpenClaw outline uses for
+sections. Each node owns the text up to the next node. Outline numbering does
+not always match the file numbering (the OpenClaw outline was renumbered after
+part one), so sections are matched on title similarity with the number as a
+tie-breaker. A section whose title no node matches falls back to the chapter
+of its leading number (``4.1`` goes to ``### 第4章：安装部署``), and failing that
+still belongs to the node of its part directory (``第二部分`` is
+``## 【第二部分】实战指南``), which is where its words are counted.
+
+Nodes are also linked into a tree by level. Word budgets written into the
+outline (``（8000字）``, ``篇幅：约12万字``) roll up from children to parents
+that have none and are split evenly down to children that have none, which
+gives every section-level node a planned length.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .book import Book, Section
+from .fsutil import sha1_bytes
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_BOLD_RE = re.compile(r"^\*\*((?:\d+(?:\.\d+)+|附录[A-Z])[\s：:].*?)\*\*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_NUMBER_RE = re.compile(r"^(?:【)?(\d+(?:\.\d+)*|附录[A-Z])(?=[\s：:】]|$)")
+_CHAPTER_RE = re.compile(r"^第\s*(\d+)\s*章")
+_BUDGET_RE = re.compile(r"[（(]\s*(?:约\s*)?([\d.]+)\s*(万)?\s*字\s*[)）]")
+_TOTAL_RE = re.compile(r"篇幅\W*(?:约\s*)?([\d.]+)\s*(万)?\s*字")
+_NOISE_RE = re.compile(r"[\W_]+")
+_POINT_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(.*)$")
+_SENTENCE_RE = re.compile(r"[^。！？；\n]+[。！？；]?")
+_MARKUP_RE = re.compile(r"[*`>#]+")
+
+BOLD_LEVEL = 7
+MATCH_THRESHOLD = 0.5
+
+
+@dataclass
+class OutlineNode:
+    level: int
+    heading: str
+    line: int
+    number: str = ""
+    title: str = ""
+    budget: int | None = None
+    # ``"4"`` for ``第4章：…`` headings, which carry no section number.
+    chapter: str = ""
+    body: list[str] = field(default_factory=list)
+    children: list["OutlineNode"] = field(default_factory=list, repr=False)
+    planned: int | None = None
+    # Title tokens for matching, filled once by :class:`Outline`.
+    tokens: set[str] | None = field(default=None, repr=False)
+
+    @property
+    def fragment(self) -> str:
+        """Heading plus the node's own text, as handed to the model."""
+        return "\n".join([self.heading, *self.body]).strip()
+
+    @property
+    def label(self) -> str:
+        return f"{self.number} {self.title}".strip()
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def key_points(self) -> list[str]:
+        """What the node promises to cover: its bullets and table rows, else its sentences."""
+        points = []
+        in_fence = False
+        rows = 0
+        for line in self.body:
+            if _FENCE_RE.match(line):
+                in_fence = not in_fence
+                continue
+            if in_fence:
+                continue
+            if line.lstrip().startswith("|"):
+                rows += 1
+                # Skip the header row and the |---| separator.
+                if rows > 2:
+                    points.append(" ".join(cell.strip() for cell in line.strip().strip("|").split("|")))
+                continue
+            rows = 0
+            point = _POINT_RE.match(line)
+            if point:
+                points.append(point.group(1))
+        if not points:
+            text = " ".join(line for line in self.body if not _FENCE_RE.match(line))
+            points = [s for s in _SENTENCE_RE.findall(text) if len(normalize_title(s)) >= 8]
+        return [_MARKUP_RE.sub("", p).strip() for p in points if p.strip()]
+
+
+def find_outline(book: Book) -> Path | None:
+    for path in sorted(book.root.glob("*.md")):
+        if "大纲" in path.stem or "纲要" in path.stem:
+            return path
+    return None
+
+
+def parse_budget(text: str) -> int | None:
+    """``（3000字）`` -> 3000, ``（2.5万字）`` -> 25000."""
+    match = _BUDGET_RE.search(text)
+    if not match:
+        return None
+    value = float(match.group(1))
+    return int(value * 10000 if match.group(2) else value)
+
+
+def _make_node(level: int, heading: str, text: str, line: int) -> OutlineNode:
+    budget = parse_budget(text)
+    text = _BUDGET_RE.sub("", text).strip()
+    number_match = _NUMBER_RE.match(text)
+    number = number_match.group(1) if number_match else ""
+    title = text[number_match.end() :] if number_match else text
+    chapter_match = _CHAPTER_RE.match(title)
+    chapter = chapter_match.group(1) if chapter_match else ""
+    return OutlineNode(level, heading, line, number, title.strip(" 　：:】*"), budget, chapter)
+
+
+def parse_outline(text: str) -> list[OutlineNode]:
+    nodes: list[OutlineNode] = []
+    preamble: list[str] = []
+    in_fence = False
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            heading = _HEADING_RE.match(line)
+            bold = None if heading else _BOLD_RE.match(line)
+            if heading:
+                nodes.append(_make_node(len(heading.group(1)), line, heading.group(2), lineno))
+                continue
+            if bold:
+                nodes.append(_make_node(BOLD_LEVEL, line, bold.group(1), lineno))
+                continue
+        (nodes[-1].body if nodes else preamble).append(line)
+    return nodes
+
+
+def build_tree(nodes: list[OutlineNode]) -> list[OutlineNode]:
+    """Link ``nodes`` by level; returns the roots."""
+    roots: list[OutlineNode] = []
+    stack: list[OutlineNode] = []
+    for node in nodes:
+        node.children = []
+        while stack and stack[-1].level >= node.level:
+            stack.pop()
+        (stack[-1].children if stack else roots).append(node)
+        stack.append(node)
+    return roots
+
+
+def allocate_budgets(roots: list[OutlineNode]) -> None:
+    """Fill ``planned`` on every node from the explicit budgets around it."""
+
+    def roll_up(node: OutlineNode) -> int | None:
+        below = [roll_up(child) for child in node.children]
+        known = [b for b in below if b is not None]
+        node.planned = node.budget if node.budget is not None else (sum(known) if known else None)
+        return node.planned
+
+    def split_down(node: OutlineNode) -> None:
+        open_children = [c for c in node.children if c.budget is None and c.planned is None]
+        if node.planned is not None and open_children:
+            assigned = sum(c.planned for c in node.children if c.planned is not None)
+            share = max(node.planned - assigned, 0) // len(open_children)
+            for child in open_children:
+                child.planned = share
+        for child in node.children:
+            split_down(child)
+
+    for root in roots:
+        roll_up(root)
+        split_down(root)
+
+
+def normalize_title(title: str) -> str:
+    return _NOISE_RE.sub("", title).lower()
+
+
+_LATIN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _title_tokens(title: str) -> set[str]:
+    """Latin words count as one token each, CJK runs contribute character bigrams."""
+    tokens = set(_LATIN_RE.findall(title.lower()))
+    for run in _LATIN_RE.split(normalize_title(title)):
+        if len(run) == 1:
+            tokens.add(run)
+        tokens.update(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _dice(tokens_a: set[str], tokens_b: set[str]) -> float:
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return 2 * len(tokens_a & tokens_b) / (len(tokens_a) + len(tokens_b))
+
+
+def title_similarity(a: str, b: str) -> float:
+    """Dice coefficient over title tokens; 1.0 for titles equal up to punctuation."""
+    return _dice(_title_tokens(a), _title_tokens(b))
+
+
+def match_score(node: OutlineNode, section_id: str, title: str, tokens: set[str] | None = None) -> float:
+    """``tokens`` are the section title's, when the caller already has them."""
+    node_tokens = node.tokens if node.tokens is not None else _title_tokens(node.title)
+    score = _dice(node_tokens, tokens if tokens is not None else _title_tokens(title))
+    if node.number and node.number == section_id:
+        score += 0.2
+    return score
+
+
+def match_section(nodes: list[OutlineNode], section_id: str, title: str) -> OutlineNode | None:
+    best, best_score = None, MATCH_THRESHOLD
+    tokens = _title_tokens(title)
+    for node in nodes:
+        score = match_score(node, section_id, title, tokens)
+        if score > best_score:
+            best, best_score = node, score
+    return best
+
+
+class Outline:
+    """Parsed outline of one book, with section lookups."""
+
+    def __init__(self, book: Book):
+        self.book = book
+        self.path = find_outline(book)
+        text = self.path.read_text(encoding="utf-8") if self.path else ""
+        self.digest = sha1_bytes(text.encode("utf-8"))
+        self.nodes = parse_outline(text)
+        for node in self.nodes:
+            node.tokens = _title_tokens(node.title)
+        self._by_line = {node.line: node for node in self.nodes}
+        self.roots = build_tree(self.nodes)
+        for root in self.roots:
+            total = _TOTAL_RE.search("\n".join(root.body)) if root.budget is None else None
+            if total:
+                root.budget = int(float(total.group(1)) * (10000 if total.group(2) else 1))
+        allocate_budgets(self.roots)
+        self._chapters: dict[str, OutlineNode] = {}
+        for node in self.nodes:
+            if node.chapter:
+                self._chapters.setdefault(node.chapter, node)
+        self._matches: dict[str, OutlineNode | None] = {}
+        self._parts: dict[str, OutlineNode | None] = {}
+
+    def node_for(self, section: Section, title: str | None = None) -> OutlineNode | None:
+        if section.rel not in self._matches:
+            node = match_section(self.nodes, section.file_id, title or section.file_title)
+            self._matches[section.rel] = node or self.node_for_chapter(section.file_id)
+        return self._matches[section.rel]
+
+    def node_for_chapter(self, section_id: str) -> OutlineNode | None:
+        """The ``第N章`` node for the leading number of ``section_id`` (``4.1`` -> 第4章)."""
+        return self._chapters.get(section_id.split(".")[0])
+
+    def node_at(self, line: int) -> OutlineNode | None:
+        return self._by_line.get(line)
+
+    def node_for_part(self, part: str) -> OutlineNode | None:
+        """Shallowest node whose title starts with the part directory's name."""
+        if part not in self._parts:
+            key = normalize_title(part)
+            found = [n for n in self.nodes if key and normalize_title(n.title).startswith(key)]
+            self._parts[part] = min(found, key=lambda n: n.level) if found else None
+        return self._parts[part]
+
+    def fragment_for(self, section: Section, title: str | None = None) -> str:
+        node = self.node_for(section, title)
+        return node.fragment if node else ""
@@ -0,0 +1,407 @@
+"""Minimal PDF writer for exported books.
+
+Text is set in ``STSong-Light`` through the ``UniGB-UCS2-H`` CMap, one of the
+standard CJK fonts every PDF viewer provides, so nothing has to be embedded
+and the layout only needs advance widths: 500/1000 for printable ASCII and
+1000/1000 for everything else, matching the ``/W`` array written into the
+font dictionary.
+
+:class:`PdfRenderer` lays one section out into A4 pages and returns a
+*fragment*: a JSON header line (page stream lengths and bookmark positions)
+followed by the Flate-compressed content streams. :func:`write_pdf` then
+streams fragments into the final file one page at a time, adding page
+numbers and a bookmark tree, so memory use does not grow with the book.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from .markdown import Block, Span, parse_inline
+
+PAGE_WIDTH = 595.28
+PAGE_HEIGHT = 841.89
+MARGIN_X = 64.0
+MARGIN_TOP = 72.0
+MARGIN_BOTTOM = 64.0
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN_X
+
+BODY_SIZE = 10.5
+CODE_SIZE = 8.5
+HEADING_SIZES = {1: 24, 2: 18, 3: 15, 4: 13, 5: 12, 6: 11}
+LEADING = 1.7
+CODE_LEADING = 1.45
+INDENT = 18.0
+
+FONT_NAME = "STSong-Light"
+FONT_ENCODING = "UniGB-UCS2-H"
+_MISSING = "25A1"  # □ for characters outside the BMP, which UCS-2 cannot encode
+# No line may start with closing punctuation; such a character hangs into the margin instead.
+_NO_BREAK_BEFORE = set("，。、；：！？）」』】》”’,.;:!?)]}%")
+_TOKEN_RE = re.compile(r"[!-~]+| +|.", re.S)
+
+
+@dataclass
+class Style:
+    size: float = BODY_SIZE
+    leading: float = LEADING
+    color: str = "0 g 0 G"
+    indent: float = 0.0
+
+
+class FontMetrics:
+    """Advance widths and UCS-2 codes, memoized per character."""
+
+    def __init__(self):
+        self._width: dict[str, float] = {}
+        self._hex: dict[str, str] = {}
+
+    def width(self, text: str, size: float) -> float:
+        total = 0.0
+        for ch in text:
+            w = self._width.get(ch)
+            if w is None:
+                w = self._width[ch] = 0.5 if " " <= ch <= "~" else 1.0
+            total += w
+        return total * size
+
+    def encode(self, text: str) -> str:
+        out = []
+        for ch in text:
+            code = self._hex.get(ch)
+            if code is None:
+                code = self._hex[ch] = f"{ord(ch):04X}" if ord(ch) < 0x10000 else _MISSING
+            out.append(code)
+        return "<" + "".join(out) + ">"
+
+
+class _Canvas:
+    def __init__(self):
+        self.pages: list[list[str]] = []
+        self.marks: list[tuple[int, str, int, float]] = []
+        self.new_page()
+
+    def new_page(self) -> None:
+        self.pages.append([])
+        self.y = PAGE_HEIGHT - MARGIN_TOP
+
+    def need(self, height: float) -> None:
+        """Start a new page unless ``height`` still fits (an empty page always fits)."""
+        if self.y - height < MARGIN_BOTTOM and self.y < PAGE_HEIGHT - MARGIN_TOP:
+            self.new_page()
+
+    def emit(self, op: str) -> None:
+        self.pages[-1].append(op)
+
+
+class PdfRenderer:
+    """Lays blocks out into page content streams. One instance per worker process."""
+
+    suffix = ".pdfpart"
+
+    def __init__(self, heading_offset: int = 1):
+        # Part titles take the top bookmark level, so a section's ``#`` sits one level below.
+        self.heading_offset = heading_offset
+        self.metrics = FontMetrics()
+        self.styles = {
+            "body": Style(),
+            "code": Style(CODE_SIZE, CODE_LEADING, "0.2 0.2 0.2 rg 0.2 0.2 0.2 RG"),
+            "quote": Style(color="0.35 g 0.35 G", indent=INDENT),
+            **{f"h{level}": Style(size, 1.4) for level, size in HEADING_SIZES.items()},
+        }
+
+    # -- line breaking -------------------------------------------------------------------
+
+    def wrap(
+        self, spans: list[Span], size: float, width: float, keep_spaces: bool = False
+    ) -> list[list[tuple[str, Span]]]:
+        """Greedy line breaking over ASCII words, spaces and single CJK characters.
+
+        Leading spaces are dropped unless ``keep_spaces`` is set (code keeps its indentation).
+        """
+        lines: list[list[tuple[str, Span]]] = [[]]
+        used = 0.0
+        for span in spans:
+            for token in _TOKEN_RE.findall(span.text.replace("\n", " ")):
+                w = self.metrics.width(token, size)
+                if used + w > width and lines[-1] and token not in _NO_BREAK_BEFORE:
+                    if token.isspace():
+                        continue
+                    lines.append([])
+                    used = 0.0
+                while w > width and len(token) > 1:
+                    # A URL or identifier longer than the line is broken anywhere.
+                    cut = 1
+                    while cut < len(token) and self.metrics.width(token[: cut + 1], size) <= width - used:
+                        cut += 1
+                    lines[-1].append((token[:cut], span))
+                    lines.append([])
+                    used = 0.0
+                    token = token[cut:]
+                    w = self.metrics.width(token, size)
+                if keep_spaces or not (token.isspace() and not lines[-1]):
+                    lines[-1].append((token, span))
+                    used += w
+        return [line for line in lines if line] or [[]]
+
+    def text_line(self, canvas: _Canvas, x: float, y: float, runs: list[tuple[str, Span]], style: Style) -> None:
+        ops = [f"BT /F1 {style.size:g} Tf {x:.2f} {y:.2f} Td {style.color}"]
+        current = None
+        text = ""
+        for chunk, span in runs:
+            key = (span.bold, span.code)
+            if key != current and text:
+                ops.append(f"{self.metrics.encode(text)} Tj")
+                text = ""
+            if key != current:
+                ops.append(f"2 Tr {style.size * 0.03:.2f} w" if span.bold else "0 Tr")
+                if span.code:
+                    ops.append("0.6 0.15 0.1 rg 0.6 0.15 0.1 RG")
+                elif current and current[1]:
+                    ops.append(style.color)
+                current = key
+            text += chunk
+        if text:
+            ops.append(f"{self.metrics.encode(text)} Tj")
+        ops.append("ET")
+        canvas.emit(" ".join(ops))
+
+    def paragraph(self, canvas: _Canvas, spans: list[Span], style: Style, indent: float = 0.0, marker: str = "") -> None:
+        x = MARGIN_X + style.indent + indent
+        line_height = style.size * style.leading
+        lines = self.wrap(spans, style.size, TEXT_WIDTH - style.indent - indent)
+        for n, runs in enumerate(lines):
+            canvas.need(line_height)
+            canvas.y -= line_height
+            if n == 0 and marker:
+                self.text_line(canvas, x - self.metrics.width(marker, style.size) - 4, canvas.y, [(marker, Span(marker))], style)
+            if style.indent:
+                canvas.emit(f"0.75 G 1.5 w {MARGIN_X + 4:.2f} {canvas.y - 3:.2f} m {MARGIN_X + 4:.2f} "
+                            f"{canvas.y + line_height - 3:.2f} l S")
+            self.text_line(canvas, x, canvas.y, runs, style)
+        canvas.y -= style.size * 0.5
+
+    # -- blocks --------------------------------------------------------------------------
+
+    def heading(self, canvas: _Canvas, text: str, level: int, spans: list[Span] | None = None) -> None:
+        style = self.styles[f"h{min(level, 6)}"]
+        # Keep a heading together with at least three lines of what follows it.
+        canvas.need(style.size * (1.2 + style.leading) + 3 * BODY_SIZE * LEADING)
+        canvas.y -= style.size * 1.2
+        canvas.marks.append((level - 1, text, len(canvas.pages) - 1, canvas.y))
+        self.paragraph(canvas, [Span(s.text, True, s.italic, s.code) for s in spans or [Span(text)]], style)
+
+    def code(self, canvas: _Canvas, text: str) -> None:
+        style = self.styles["code"]
+        line_height = style.size * style.leading
+        pad = 4.0
+        canvas.y -= pad
+        for raw in text.expandtabs(4).split("\n"):
+            for runs in self.wrap([Span(raw)], style.size, TEXT_WIDTH - 2 * pad, keep_spaces=True):
+                canvas.need(line_height)
+                canvas.emit(f"0.95 g {MARGIN_X:.2f} {canvas.y - line_height:.2f} {TEXT_WIDTH:.2f} {line_height:.2f} re f")
+                canvas.y -= line_height
+                self.text_line(canvas, MARGIN_X + pad, canvas.y + style.size * 0.35, runs, style)
+        canvas.y -= pad + BODY_SIZE * 0.6
+
+    def table(self, canvas: _Canvas, rows: list[list[str]]) -> None:
+        style = self.styles["body"]
+        size = style.size * 0.9
+        line_height = size * 1.5
+        columns = max(len(row) for row in rows)
+        width = TEXT_WIDTH / columns
+        pad = 4.0
+        canvas.y -= 4
+        canvas.emit(f"0.6 G 0.5 w {MARGIN_X:.2f} {canvas.y:.2f} m {MARGIN_X + TEXT_WIDTH:.2f} {canvas.y:.2f} l S")
+        for n, row in enumerate(rows):
+            cells = [self.wrap(parse_inline(cell, bold=n == 0), size, width - 2 * pad) for cell in row]
+            height = max(len(cell) for cell in cells) * line_height + 2 * pad
+            if canvas.y - height < MARGIN_BOTTOM:
+                canvas.new_page()
+                canvas.emit(f"0.6 G 0.5 w {MARGIN_X:.2f} {canvas.y:.2f} m {MARGIN_X + TEXT_WIDTH:.2f} {canvas.y:.2f} l S")
+            top = canvas.y
+            cell_style = Style(size, style.leading, style.color)
+            for c, lines in enumerate(cells):
+                y = top - pad
+                for runs in lines:
+                    y -= line_height
+                    self.text_line(canvas, MARGIN_X + c * width + pad, y + size * 0.3, runs, cell_style)
+            canvas.y = top - height
+            xs = " ".join(
+                f"{MARGIN_X + c * width:.2f} {top:.2f} m {MARGIN_X + c * width:.2f} {canvas.y:.2f} l"
+                for c in range(columns + 1)
+            )
+            canvas.emit(f"0.6 G 0.5 w {MARGIN_X:.2f} {canvas.y:.2f} m {MARGIN_X + TEXT_WIDTH:.2f} {canvas.y:.2f} l {xs} S")
+        canvas.y -= BODY_SIZE * 0.8
+
+    def block(self, canvas: _Canvas, block: Block) -> None:
+        if block.kind == "heading":
+            self.heading(canvas, block.text, block.level + self.heading_offset, block.spans)
+        elif block.kind == "code":
+            self.code(canvas, block.text)
+        elif block.kind == "quote":
+            self.paragraph(canvas, block.spans, self.styles["quote"])
+        elif block.kind == "item":
+            self.paragraph(canvas, block.spans, self.styles["body"], INDENT * (block.level + 1), block.marker)
+        elif block.kind == "table":
+            self.table(canvas, block.rows)
+        elif block.kind == "rule":
+            canvas.need(BODY_SIZE * 2)
+            canvas.y -= BODY_SIZE
+            canvas.emit(f"0.7 G 0.5 w {MARGIN_X:.2f} {canvas.y:.2f} m {MARGIN_X + TEXT_WIDTH:.2f} {canvas.y:.2f} l S")
+            canvas.y -= BODY_SIZE
+        else:
+            self.paragraph(canvas, block.spans, self.styles["body"])
+
+    def render(self, blocks: list[Block]) -> bytes:
+        canvas = _Canvas()
+        for block in blocks:
+            self.block(canvas, block)
+        return encode_fragment(canvas)
+
+    def part(self, title: str) -> bytes:
+        canvas = _Canvas()
+        style = self.styles["h1"]
+        canvas.y = PAGE_HEIGHT * 0.62
+        canvas.marks.append((0, title, 0, canvas.y + style.size))
+        width = self.metrics.width(title, style.size)
+        x = max(MARGIN_X, (PAGE_WIDTH - width) / 2)
+        self.text_line(canvas, x, canvas.y, [(title, Span(title, True))], style)
+        return encode_fragment(canvas)
+
+
+def encode_fragment(canvas: _Canvas) -> bytes:
+    streams = [zlib.compress("\n".join(ops).encode("ascii"), 6) for ops in canvas.pages]
+    header = {"pages": [len(s) for s in streams], "marks": canvas.marks}
+    return json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n" + b"".join(streams)
+
+
+class _Writer:
+    def __init__(self, fh):
+        self.fh = fh
+        self.offsets: dict[int, int] = {}
+        self.count = 0
+        fh.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self) -> int:
+        self.count += 1
+        return self.count
+
+    def write(self, num: int, body: str, stream: bytes | None = None) -> None:
+        self.offsets[num] = self.fh.tell()
+        if stream is None:
+            self.fh.write(f"{num} 0 obj\n{body}\nendobj\n".encode("ascii"))
+            return
+        self.fh.write(f"{num} 0 obj\n<< {body} /Length {len(stream)} >>\nstream\n".encode("ascii"))
+        self.fh.write(stream)
+        self.fh.write(b"\nendstream\nendobj\n")
+
+
+def _text_string(text: str) -> str:
+    return "<FEFF" + text.encode("utf-16-be").hex().upper() + ">"
+
+
+def _fragment_pages(fragment: bytes | Path):
+    """Yield the header, then each compressed page stream, reading one page at a time."""
+    if isinstance(fragment, bytes):
+        head, _, rest = fragment.partition(b"\n")
+        header = json.loads(head)
+        yield header
+        pos = 0
+        for length in header["pages"]:
+            yield rest[pos : pos + length]
+            pos += length
+        return
+    with open(fragment, "rb") as fh:
+        header = json.loads(fh.readline())
+        yield header
+        for length in header["pages"]:
+            yield fh.read(length)
+
+
+def write_pdf(output: Path, title: str, fragments) -> int:
+    """Write the document; ``fragments`` yields bytes or paths of cached fragments. Returns the page count."""
+    metrics = FontMetrics()
+    tmp = output.with_name(output.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        pdf = _Writer(fh)
+        catalog, pages, font, cid_font, descriptor, info = (pdf.reserve() for _ in range(6))
+        pdf.write(font, f"<< /Type /Font /Subtype /Type0 /BaseFont /{FONT_NAME} /Encoding /{FONT_ENCODING} "
+                        f"/DescendantFonts [{cid_font} 0 R] >>")
+        pdf.write(cid_font, f"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /{FONT_NAME} "
+                            "/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >> "
+                            f"/FontDescriptor {descriptor} 0 R /DW 1000 /W [1 95 500] >>")
+        pdf.write(descriptor, f"<< /Type /FontDescriptor /FontName /{FONT_NAME} /Flags 6 "
+                              "/FontBBox [-25 -254 1000 880] /ItalicAngle 0 /Ascent 880 /Descent -120 "
+                              "/CapHeight 880 /StemV 93 >>")
+        kids: list[int] = []
+        marks: list[tuple[int, str, int, float]] = []
+        resources = f"/Resources << /Font << /F1 {font} 0 R >> >> /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]"
+        for fragment in fragments:
+            stream = _fragment_pages(fragment)
+            header = next(stream)
+            first = len(kids)
+            for content in stream:
+                content_id, number_id, page_id = pdf.reserve(), pdf.reserve(), pdf.reserve()
+                label = str(len(kids) + 1)
+                x = (PAGE_WIDTH - metrics.width(label, 9)) / 2
+                footer = f"BT /F1 9 Tf {x:.2f} 36 Td 0.4 g {metrics.encode(label)} Tj ET".encode("ascii")
+                pdf.write(content_id, "/Filter /FlateDecode", content)
+                pdf.write(number_id, "", footer)
+                pdf.write(page_id, f"<< /Type /Page /Parent {pages} 0 R {resources} "
+                                   f"/Contents [{content_id} 0 R {number_id} 0 R] >>")
+                kids.append(page_id)
+            marks.extend((level, text, kids[first + page], y) for level, text, page, y in header["marks"])
+
+        outlines = _write_outlines(pdf, marks)
+        pdf.write(pages, f"<< /Type /Pages /Count {len(kids)} /Kids [{' '.join(f'{k} 0 R' for k in kids)}] >>")
+        outline_ref = f" /Outlines {outlines} 0 R /PageMode /UseOutlines" if outlines else ""
+        pdf.write(catalog, f"<< /Type /Catalog /Pages {pages} 0 R{outline_ref} >>")
+        pdf.write(info, f"<< /Title {_text_string(title)} /Producer (booktool) >>")
+
+        xref = fh.tell()
+        fh.write(f"xref\n0 {pdf.count + 1}\n0000000000 65535 f \n".encode("ascii"))
+        fh.write("".join(f"{pdf.offsets[n]:010d} 00000 n \n" for n in range(1, pdf.count + 1)).encode("ascii"))
+        fh.write(f"trailer\n<< /Size {pdf.count + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+                 f"startxref\n{xref}\n%%EOF\n".encode("ascii"))
+    tmp.replace(output)
+    return len(kids)
+
+
+def _write_outlines(pdf: _Writer, marks: list[tuple[int, str, int, float]]) -> int | None:
+    """Bookmark tree from ``(level, title, page_obj, y)``; top-level items start collapsed."""
+    if not marks:
+        return None
+    root = pdf.reserve()
+    nodes = [{"id": pdf.reserve(), "level": level, "title": title, "page": page, "y": y, "children": []}
+             for level, title, page, y in marks]
+    top: list[dict] = []
+    stack: list[dict] = []
+    for node in nodes:
+        while stack and stack[-1]["level"] >= node["level"]:
+            stack.pop()
+        node["parent"] = stack[-1]["id"] if stack else root
+        (stack[-1]["children"] if stack else top).append(node)
+        stack.append(node)
+
+    def write_level(items: list[dict]) -> None:
+        for n, node in enumerate(items):
+            refs = f"/Parent {node['parent']} 0 R"
+            if n:
+                refs += f" /Prev {items[n - 1]['id']} 0 R"
+            if n + 1 < len(items):
+                refs += f" /Next {items[n + 1]['id']} 0 R"
+            children = node["children"]
+            if children:
+                refs += f" /First {children[0]['id']} 0 R /Last {children[-1]['id']} 0 R /Count -{len(children)}"
+            pdf.write(node["id"], f"<< /Title {_text_string(node['title'])} {refs} "
+                                  f"/Dest [{node['page']} 0 R /XYZ 0 {node['y'] + 24:.2f} null] >>")
+            write_level(children)
+
+    write_level(top)
+    pdf.write(root, f"<< /Type /Outlines /First {top[0]['id']} 0 R /Last {top[-1]['id']} 0 R /Count {len(top)} >>")
+    return root
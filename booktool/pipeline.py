@@ -0,0 +1,355 @@
+"""The research → draft → review pipeline over a book's sections.
+
+Each section gets the steps its front-matter ``status`` has not reached yet:
+an ``outline`` section needs all three, a ``researched`` one needs draft and
+review, and so on; ``final`` and statuses the pipeline does not know count as
+finished. A step only ever raises the status, so rerunning research on a
+reviewed section leaves it ``reviewed``. Steps run on :class:`booktool.scheduler.Scheduler` with the
+book's ``.batch_state.json`` as the checkpoint. Outputs follow the existing
+convention: research notes and review notes sit next to the section as
+``<id>_research.md`` / ``<id>_review.md``. A draft fills in a section whose
+body is still empty (headings only) and bumps its front matter; a section
+that already has text is never overwritten, its draft goes to
+``<id>_draft.md`` instead.
+
+``--rerun`` replays research and review whatever the status (drafting only
+when asked for with ``--operations``). It still goes through the checkpoint:
+the time the rerun started is stored in it, tasks finished since then count
+as done, so an interrupted rerun resumes. Records of tasks outside the rerun
+are kept, and the records a rerun supersedes move to the checkpoint's
+``history`` list.
+
+Model calls go through :class:`booktool.cache.ResponseCache` unless disabled,
+keyed on the prompt and the section's outline fragment, so ``--rerun`` over
+unchanged sections is answered from disk.
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+from .book import Book, Section, parse_front_matter_lines, resolve_books, split_front_matter, update_front_matter
+from .cache import DEFAULT_MAX_BYTES, ResponseCache, open_cache
+from .fsutil import atomic_write_bytes
+from .llm import Model, load_model, parse_spec
+from .outline import Outline
+from .scheduler import COMPLETED, PENDING, Checkpoint, Scheduler, Task
+from .stats import StatsIndex, count_words
+from .trace import count, span
+
+OPERATIONS = ("research", "draft", "review")
+# What --rerun replays unless operations are named: drafting rewrites sections.
+RERUN_OPERATIONS = ("research", "review")
+# Front-matter status a section reaches once each operation has run.
+STATUS_AFTER = {"research": "researched", "draft": "draft", "review": "reviewed"}
+STATUS_ORDER = ("outline", "researched", "draft", "reviewed", "final")
+STATE_NAME = ".batch_state.json"
+RERUN_KEY = "rerun_started_at"
+HISTORY_KEY = "history"
+
+
+def notes_path(section: Section, kind: str) -> Path:
+    return section.path.with_name(f"{section.file_id}_{kind}.md")
+
+
+def status_rank(status: object) -> int:
+    """Position of ``status`` in :data:`STATUS_ORDER`; unknown statuses rank as finished."""
+    status = str(status or "outline")
+    return STATUS_ORDER.index(status) if status in STATUS_ORDER else len(STATUS_ORDER) - 1
+
+
+def raised_status(text: str, status: str) -> dict[str, object]:
+    """``{"status": status}`` if that is later than the status in ``text``'s front matter, else ``{}``."""
+    front, _ = split_front_matter(text)
+    current = parse_front_matter_lines(front.splitlines()).get("status")
+    return {"status": status} if status_rank(status) > status_rank(current) else {}
+
+
+def has_text(body: str) -> bool:
+    """Whether a section body holds anything besides headings and blank lines."""
+    return any(line.strip() and not line.lstrip().startswith("#") for line in body.splitlines())
+
+
+def plan_tasks(
+    book: Book,
+    operations: tuple[str, ...] = OPERATIONS,
+    only: set[str] | None = None,
+    rerun: bool = False,
+) -> list[Task]:
+    """One task per outstanding (section, operation), chained in pipeline order.
+
+    With ``rerun`` every selected operation is planned whatever the status.
+    """
+    index = StatsIndex(book)
+    tasks = []
+    for section in book.sections:
+        meta = index.get(section).meta
+        section_id = str(meta.get("section_id") or section.file_id)
+        if only and section_id not in only and section.rel not in only:
+            continue
+        reached = -1 if rerun else status_rank(meta.get("status"))
+        previous = None
+        for op in OPERATIONS:
+            if STATUS_ORDER.index(STATUS_AFTER[op]) <= reached or op not in operations:
+                continue
+            task = Task(
+                task_id=f"{section.rel}:{op}",
+                section_id=section_id,
+                operation=op,
+                path=section.rel,
+                depends_on=[previous] if previous else [],
+            )
+            tasks.append(task)
+            previous = task.task_id
+    return tasks
+
+
+def merge_checkpoint(planned: list[Task], saved: dict[str, Task]) -> list[Task]:
+    """Carry finished work and attempt history over from a previous run."""
+    merged = []
+    matched = set()
+    for task in planned:
+        key = task.task_id if task.task_id in saved else f"{task.section_id}:{task.operation}"
+        old = saved.get(key)
+        if old is not None:
+            matched.add(key)
+            task.status, task.attempts = old.status, old.attempts
+            task.started_at, task.completed_at = old.started_at, old.completed_at
+            task.agent_id, task.error_msg, task.output = old.agent_id, old.error_msg, old.output
+        merged.append(task)
+    # Finished tasks outside this plan stay in the checkpoint as history.
+    merged.extend(t for key, t in saved.items() if key not in matched and t.status == COMPLETED)
+    return merged
+
+
+def plan_run(
+    book: Book,
+    checkpoint: Checkpoint,
+    operations: tuple[str, ...],
+    only: set[str] | None = None,
+    rerun: bool = False,
+    started_at: str | None = None,
+) -> list[Task]:
+    """Planned tasks merged with the checkpoint; on a rerun, work finished before ``started_at`` is redone.
+
+    The superseded records are appended to ``checkpoint.meta["history"]``
+    (in memory; the next save writes them).
+    """
+    planned = plan_tasks(book, operations, only, rerun)
+    tasks = merge_checkpoint(planned, checkpoint.load())
+    history = list(checkpoint.meta.get(HISTORY_KEY, []))
+    if rerun:
+        cutoff = datetime.fromisoformat(started_at or datetime.now().isoformat())
+        ids = {t.task_id for t in planned}
+        for task in tasks:
+            if task.task_id not in ids or task.status != COMPLETED:
+                continue
+            if task.completed_at is None or datetime.fromisoformat(task.completed_at) < cutoff:
+                history.append(asdict(task))
+                task.status, task.attempts, task.agent_id = PENDING, 0, None
+                task.started_at = task.completed_at = task.error_msg = task.output = None
+    if history:
+        checkpoint.meta[HISTORY_KEY] = history
+    return tasks
+
+
+class PipelineHandler:
+    """Turns a scheduled task into a model call plus the file it produces."""
+
+    def __init__(
+        self,
+        book: Book,
+        model: Model,
+        params: dict | None = None,
+        cache: ResponseCache | None = None,
+        model_options: dict | None = None,
+    ):
+        self.book = book
+        self.model = model
+        self.params = params or {}
+        self.cache = cache
+        # The --model spec's options, so the cache tells configurations apart.
+        self.model_options = model_options or {}
+        self.outline = Outline(book)
+        self.sections = {s.rel: s for s in book.sections}
+
+    def __call__(self, task: Task, agent_id: int) -> str:
+        section = self.sections[task.path]
+        with span(f"pipeline.{task.operation}", section=task.path):
+            return getattr(self, f"_{task.operation}")(section)
+
+    def prompt(self, section: Section, operation: str, material: str = "", outline: str = "") -> str:
+        title = section.file_title
+        header = f"《{self.book.name}》 {section.file_id} {title}"
+        instructions = {
+            "research": "请为本节整理研究笔记：关键事实、数据来源、可引用的案例。",
+            "draft": "请根据研究笔记撰写本节正文，使用 Markdown，面向普通读者。",
+            "review": "请审校本节正文，列出事实错误、结构问题和需要补充的内容。",
+        }[operation]
+        if outline:
+            instructions += f"\n\n大纲：\n{outline}"
+        return f"{header}\n{instructions}\n\n{material}".rstrip() + "\n"
+
+    def _complete(self, section: Section, operation: str, material: str = "") -> str:
+        outline = self.outline.fragment_for(section)
+        prompt = self.prompt(section, operation, material, outline)
+        if self.cache is None:
+            completion = self.model.complete(prompt, **self.params)
+            count(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+            return completion.text
+        completion = self.cache.complete(
+            self.model,
+            prompt,
+            self.params,
+            outline=outline,
+            section=section.rel,
+            section_id=section.file_id,
+            options=self.model_options,
+        )
+        return completion.text
+
+    def _research(self, section: Section) -> str:
+        notes = notes_path(section, "research")
+        atomic_write_bytes(notes, self._complete(section, "research").encode("utf-8"))
+        self._set_status(section, STATUS_AFTER["research"])
+        return f"研究笔记已保存: {notes.name}"
+
+    def _draft(self, section: Section) -> str:
+        notes = notes_path(section, "research")
+        material = notes.read_text(encoding="utf-8") if notes.exists() else ""
+        body = self._complete(section, "draft", material).strip()
+        text = section.path.read_text(encoding="utf-8")
+        if has_text(split_front_matter(text)[1]):
+            aside = notes_path(section, "draft")
+            atomic_write_bytes(aside, f"# {section.file_title}\n\n{body}\n".encode("utf-8"))
+            return f"正文已存在，草稿另存为: {aside.name}"
+        text = update_front_matter(text, {**raised_status(text, "draft"), "word_count": count_words(body)})
+        front, _ = split_front_matter(text)
+        text = f"---\n{front}\n---\n\n# {section.file_title}\n\n{body}\n"
+        atomic_write_bytes(section.path, text.encode("utf-8"))
+        return f"草稿已保存: {section.path.name}"
+
+    def _review(self, section: Section) -> str:
+        _, body = split_front_matter(section.path.read_text(encoding="utf-8"))
+        notes = notes_path(section, "review")
+        atomic_write_bytes(notes, self._complete(section, "review", body).encode("utf-8"))
+        self._set_status(section, STATUS_AFTER["review"])
+        return f"审校意见已保存: {notes.name}"
+
+    @staticmethod
+    def _set_status(section: Section, status: str) -> None:
+        text = section.path.read_text(encoding="utf-8")
+        updates = raised_status(text, status)
+        if updates:
+            atomic_write_bytes(section.path, update_front_matter(text, updates).encode("utf-8"))
+
+
+def run_pipeline(
+    book: Book,
+    model: Model,
+    max_workers: int = 5,
+    operations: tuple[str, ...] | None = None,
+    only: set[str] | None = None,
+    max_attempts: int = 3,
+    backoff: float = 1.0,
+    cache: ResponseCache | None = None,
+    rerun: bool = False,
+    model_options: dict | None = None,
+) -> Scheduler:
+    """Run the pipeline on one book; ``operations`` defaults to all, or research and review on a rerun."""
+    if operations is None:
+        operations = RERUN_OPERATIONS if rerun else OPERATIONS
+    checkpoint = Checkpoint(book.root / STATE_NAME, max_workers)
+    checkpoint.load()
+    started_at = None
+    if rerun:
+        # Resume an interrupted rerun rather than starting it over.
+        started_at = str(checkpoint.meta.get(RERUN_KEY) or datetime.now().isoformat())
+        checkpoint.set_meta(RERUN_KEY, started_at)
+    tasks = plan_run(book, checkpoint, operations, only, rerun, started_at)
+    scheduler = Scheduler(
+        tasks,
+        PipelineHandler(book, model, cache=cache, model_options=model_options),
+        max_workers=max_workers,
+        checkpoint=checkpoint,
+        max_attempts=max_attempts,
+        backoff=backoff,
+    )
+    scheduler.run()
+    if rerun and not scheduler.report.failed:
+        checkpoint.set_meta(RERUN_KEY, None)
+    return scheduler
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("run", help="run the research/draft/review pipeline")
+    parser.add_argument("books", nargs="*", help="book directories (default: every book in the repo)")
+    parser.add_argument(
+        "--model",
+        help="'module:factory[:k=v,...]', or 'stub[:k=v,...]' for the offline stub (required unless --dry-run)",
+    )
+    parser.add_argument("--workers", type=int, default=5, help="worker threads (default: 5)")
+    parser.add_argument(
+        "--operations",
+        help=f"comma-separated subset of {','.join(OPERATIONS)} (default: all; {','.join(RERUN_OPERATIONS)} with --rerun)",
+    )
+    parser.add_argument("--sections", default="", help="comma-separated section ids or paths to limit the run")
+    parser.add_argument("--max-attempts", type=int, default=3, help="attempts per task before it fails")
+    parser.add_argument("--backoff", type=float, default=1.0, help="base retry delay in seconds")
+    parser.add_argument(
+        "--rerun", action="store_true",
+        help="run the selected operations again whatever the status; resumes an interrupted rerun",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="always call the model")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // 2**20, help="cache budget in MiB")
+    parser.add_argument("--dry-run", action="store_true", help="list the tasks that would run and exit")
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    operations = tuple(op for op in args.operations.split(",") if op) if args.operations else None
+    unknown = set(operations or ()) - set(OPERATIONS)
+    if unknown:
+        print(f"unknown operation(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    only = {s for s in args.sections.split(",") if s} or None
+    if not args.dry_run and not args.model:
+        # The pipeline rewrites sections and notes, so never fall back to the fake model silently.
+        print("--model is required (pass --model stub to run the offline stub)", file=sys.stderr)
+        return 2
+    model = None if args.dry_run else load_model(args.model)
+    model_options = None if model is None else parse_spec(args.model)[1]
+    failed = 0
+    for book in resolve_books(args.books):
+        if args.dry_run:
+            checkpoint = Checkpoint(book.root / STATE_NAME, args.workers)
+            checkpoint.load()
+            planned_ops = operations or (RERUN_OPERATIONS if args.rerun else OPERATIONS)
+            started_at = checkpoint.meta.get(RERUN_KEY) if args.rerun else None
+            for task in plan_run(book, checkpoint, planned_ops, only, args.rerun, started_at):
+                if task.status != COMPLETED:
+                    print(f"{book.name}\t{task.task_id}")
+            continue
+        cache = None if args.no_cache else open_cache(book, args.cache_size * 2**20)
+        try:
+            scheduler = run_pipeline(
+                book,
+                model,
+                args.workers,
+                operations,
+                only,
+                args.max_attempts,
+                args.backoff,
+                cache,
+                args.rerun,
+                model_options,
+            )
+        finally:
+            if cache is not None:
+                cache.close()
+        failed += scheduler.report.failed
+        print(f"{book.name}: {scheduler.report.summary()}")
+    return 1 if failed else 0
@@ -0,0 +1,114 @@
+"""Regenerate ``progress.json`` from the section files.
+
+The two books use slightly different schemas (``word_count`` vs
+``actual_words`` plus ``file`` and book totals in the OPC book). The existing
+file is used as the template, so each book keeps its own keys and key order;
+only the values are refreshed from :mod:`booktool.stats`. Titles, statuses
+and targets come from front matter, word counts are measured.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from datetime import datetime
+
+from .book import Book, Section, resolve_books
+from .fsutil import atomic_write_json, load_json
+from .stats import SectionStats, StatsIndex
+from .trace import span
+
+COMPLETED_STATUSES = frozenset({"draft", "reviewed", "final"})
+_DEFAULT_ENTRY_KEYS = ("section_id", "title", "chapter", "status", "word_count", "target_words")
+
+
+def _entry_key(entry: dict) -> tuple[str, str]:
+    return entry.get("chapter", ""), entry.get("file") or str(entry.get("section_id", ""))
+
+
+def build_progress(book: Book, stats: dict[str, SectionStats], previous: dict) -> dict:
+    old_entries = previous.get("sections", [])
+    template = list(old_entries[0]) if old_entries else list(_DEFAULT_ENTRY_KEYS)
+    by_file = {_entry_key(e): e for e in old_entries if "file" in e}
+    by_id = {(e.get("chapter", ""), str(e.get("section_id", ""))): e for e in old_entries}
+
+    sections = []
+    for section in book.sections:
+        entry = _section_entry(section, stats[section.rel], template, by_file, by_id)
+        sections.append(entry)
+
+    progress = dict(previous)
+    progress["total_sections"] = len(sections)
+    if "completed_sections" in progress:
+        progress["completed_sections"] = sum(1 for e in sections if e["status"] in COMPLETED_STATUSES)
+    word_field = "actual_words" if "actual_words" in template else "word_count"
+    if "total_words" in progress:
+        progress["total_words"] = sum(e[word_field] for e in sections)
+    if "total_target" in progress:
+        progress["total_target"] = sum(e["target_words"] for e in sections)
+    progress["sections"] = sections
+    return progress
+
+
+def _section_entry(section: Section, stat: SectionStats, template: list[str], by_file: dict, by_id: dict) -> dict:
+    meta = stat.meta
+    section_id = str(meta.get("section_id") or section.file_id)
+    old = by_file.get((section.part, section.path.name)) or by_id.get((section.part, section_id), {})
+    values = {
+        "section_id": section_id,
+        "title": meta.get("title") or old.get("title") or section.file_title,
+        "chapter": section.part,
+        "file": section.path.name,
+        "status": meta.get("status") or old.get("status") or "outline",
+        "target_words": meta.get("target_words") or old.get("target_words") or 0,
+        "word_count": stat.words,
+        "actual_words": stat.words,
+    }
+    entry = {key: values.get(key, old.get(key)) for key in template}
+    for key, value in old.items():
+        entry.setdefault(key, value)
+    return entry
+
+
+def _comparable(progress: dict) -> dict:
+    return {k: v for k, v in progress.items() if k != "updated_at"}
+
+
+def regenerate(book: Book, check: bool = False) -> tuple[bool, StatsIndex]:
+    """Rebuild one book's progress file; return whether it changed."""
+    with span("progress.book", book=book.name):
+        index = StatsIndex(book)
+        stats = index.refresh()
+        previous = load_json(book.progress_path, {})
+        progress = build_progress(book, stats, previous)
+        changed = _comparable(progress) != _comparable(previous)
+        if changed and not check:
+            if "updated_at" in progress or not previous:
+                progress["updated_at"] = datetime.now().isoformat()
+                progress = {"updated_at": progress.pop("updated_at"), **progress}
+            atomic_write_json(book.progress_path, progress)
+    return changed, index
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("progress", help="regenerate progress.json from section front matter")
+    parser.add_argument("books", nargs="*", help="book directories (default: every book in the repo)")
+    parser.add_argument("--check", action="store_true", help="only report drift; exit 1 if any file is stale")
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    started = time.perf_counter()
+    stale = 0
+    scanned = total = 0
+    for book in resolve_books(args.books):
+        changed, index = regenerate(book, check=args.check)
+        scanned += len(index.rescanned)
+        total += len(book.sections)
+        if changed:
+            stale += 1
+            verb = "stale" if args.check else "updated"
+            print(f"{verb}: {book.progress_path.relative_to(book.root.parent)}")
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{total} section(s), {scanned} re-scanned in {elapsed:.1f} ms", file=sys.stderr)
+    return 1 if args.check and stale else 0
@@ -0,0 +1,315 @@
+"""Resumable work-stealing task scheduler.
+
+Tasks form a DAG (``research -> draft -> review`` per section). Each worker
+thread owns a deque: it pops its own newest task and, when empty, steals the
+oldest task from another worker. A finished task pushes the tasks it
+unblocks onto the finishing worker's deque, so a section's next step tends to
+run on the same worker while idle workers keep the pool busy. There are no
+batch barriers, so one slow call only occupies one worker.
+
+State is checkpointed to a JSON file (``.batch_state.json`` for the book
+pipeline) with an atomic replace. Finished attempts are flushed by a
+background thread at most ``checkpoint_interval`` seconds apart (``0`` writes
+after every attempt), so a killed run loses at most that window. Loading a
+checkpoint keeps completed tasks and requeues everything else, so a killed
+run resumes where it stopped.
+"""
+
+from __future__ import annotations
+
+import collections
+import heapq
+import random
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from .fsutil import atomic_write_json, load_json
+from .llm import PermanentModelError
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Errors that mean "slow down" get a longer backoff than ordinary failures.
+_THROTTLE_RE = re.compile(r"429|rate.?limit|overloaded|quota|too many requests", re.I)
+
+
+@dataclass
+class Task:
+    task_id: str
+    section_id: str
+    operation: str
+    path: str = ""
+    depends_on: list[str] = field(default_factory=list)
+    status: str = PENDING
+    agent_id: int | None = None
+    attempts: int = 0
+    started_at: str | None = None
+    completed_at: str | None = None
+    error_msg: str | None = None
+    output: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+def retry_delay(error_msg: str | None, attempt: int, base: float, cap: float = 60.0) -> float:
+    """Exponential backoff with jitter; throttling errors back off four times harder."""
+    if error_msg and _THROTTLE_RE.search(error_msg):
+        base *= 4
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Checkpoint:
+    """Atomic JSON snapshot of every task plus scheduler settings."""
+
+    _OWN_KEYS = ("tasks", "max_workers", "updated_at")
+
+    def __init__(self, path: Path, max_workers: int):
+        self.path = path
+        self.max_workers = max_workers
+        # Extra top-level keys callers keep in the file (the pipeline's rerun marker).
+        self.meta: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._written = -1
+
+    def load(self) -> dict[str, Task]:
+        data = load_json(self.path, {})
+        self.meta = {k: v for k, v in data.items() if k not in self._OWN_KEYS}
+        tasks = {}
+        for raw in data.get("tasks", []):
+            if "task_id" not in raw:
+                # Pre-scheduler files carry no ids; they only record finished research.
+                raw = {**raw, "task_id": f"{raw.get('path') or raw['section_id']}:{raw['operation']}"}
+            task = Task.from_dict(raw)
+            if task.status == FAILED:
+                task.attempts = 0
+            if task.status != COMPLETED:
+                task.status, task.agent_id = PENDING, None
+            tasks[task.task_id] = task
+        return tasks
+
+    def save(self, tasks: list[Task], version: int = 0) -> None:
+        """Write ``tasks``; snapshots older than the last one written are dropped."""
+        with self._lock:
+            if version < self._written:
+                return
+            self._written = version
+            atomic_write_json(
+                self.path,
+                {
+                    "tasks": [asdict(t) for t in tasks],
+                    "max_workers": self.max_workers,
+                    "updated_at": datetime.now().isoformat(),
+                    **self.meta,
+                },
+            )
+
+    def set_meta(self, key: str, value: object | None) -> None:
+        """Set (or with ``None`` remove) an extra key and rewrite the file around the saved tasks."""
+        with self._lock:
+            if value is None:
+                self.meta.pop(key, None)
+            else:
+                self.meta[key] = value
+            data = load_json(self.path, {})
+            data = {k: v for k, v in data.items() if k in self._OWN_KEYS}
+            data.setdefault("tasks", [])
+            data.setdefault("max_workers", self.max_workers)
+            atomic_write_json(self.path, {**data, **self.meta})
+
+
+@dataclass
+class RunReport:
+    completed: int = 0
+    failed: int = 0
+    retried: int = 0
+    stolen: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.completed} completed, {self.failed} failed, {self.retried} retried, "
+            f"{self.stolen} stolen in {self.elapsed:.2f} s"
+        )
+
+
+class Scheduler:
+    """Run a DAG of :class:`Task` objects on a work-stealing thread pool.
+
+    ``handler(task, agent_id)`` does the work and returns the ``output``
+    string stored on the task. Any exception fails the attempt; a
+    :class:`PermanentModelError` fails the task outright.
+    """
+
+    def __init__(
+        self,
+        tasks: list[Task],
+        handler: Callable[[Task, int], str],
+        max_workers: int = 5,
+        checkpoint: Checkpoint | None = None,
+        max_attempts: int = 3,
+        backoff: float = 1.0,
+        checkpoint_interval: float = 0.25,
+    ):
+        self.tasks = {t.task_id: t for t in tasks}
+        self.handler = handler
+        self.max_workers = max(1, max_workers)
+        self.checkpoint = checkpoint
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.checkpoint_interval = checkpoint_interval
+
+        self._cond = threading.Condition()
+        self._deques = [collections.deque() for _ in range(self.max_workers)]
+        self._delayed: list[tuple[float, int, str]] = []
+        self._waiting_on: dict[str, int] = {}
+        self._dependents: dict[str, list[str]] = collections.defaultdict(list)
+        self._outstanding = 0
+        self._seq = 0
+        self._version = 0
+        self._saved_version = 0
+        self._finished = threading.Event()
+        self.report = RunReport()
+
+    def run(self) -> RunReport:
+        started = time.perf_counter()
+        self._seed()
+        if self._outstanding:
+            workers = [
+                threading.Thread(target=self._worker, args=(i,), name=f"booktool-worker-{i + 1}", daemon=True)
+                for i in range(self.max_workers)
+            ]
+            if self.checkpoint is not None and self.checkpoint_interval > 0:
+                workers.append(threading.Thread(target=self._flusher, name="booktool-checkpoint", daemon=True))
+            for w in workers:
+                w.start()
+            for w in workers[: self.max_workers]:
+                w.join()
+            self._finished.set()
+            for w in workers[self.max_workers :]:
+                w.join()
+        self._save()
+        self.report.elapsed = time.perf_counter() - started
+        return self.report
+
+    def _seed(self) -> None:
+        ready = []
+        for task in self.tasks.values():
+            if task.status == COMPLETED:
+                continue
+            if task.status == FAILED:
+                task.status, task.attempts, task.error_msg = PENDING, 0, None
+            missing = [d for d in task.depends_on if d in self.tasks and self.tasks[d].status != COMPLETED]
+            for dep in missing:
+                self._dependents[dep].append(task.task_id)
+            self._waiting_on[task.task_id] = len(missing)
+            self._outstanding += 1
+            if not missing:
+                ready.append(task.task_id)
+        for i, task_id in enumerate(ready):
+            self._deques[i % self.max_workers].appendleft(task_id)
+
+    def _take(self, me: int) -> str | None:
+        """Next task for worker ``me``; ``None`` once the DAG is exhausted."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, task_id = heapq.heappop(self._delayed)
+                    self._deques[me].append(task_id)
+                if self._deques[me]:
+                    return self._deques[me].pop()
+                victim = max(range(self.max_workers), key=lambda i: len(self._deques[i]))
+                if self._deques[victim]:
+                    self.report.stolen += 1
+                    return self._deques[victim].popleft()
+                if self._outstanding == 0:
+                    self._cond.notify_all()
+                    return None
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._cond.wait(timeout)
+
+    def _worker(self, index: int) -> None:
+        agent_id = index + 1
+        while (task_id := self._take(index)) is not None:
+            task = self.tasks[task_id]
+            with self._cond:
+                task.status, task.agent_id = RUNNING, agent_id
+                task.started_at, task.completed_at = datetime.now().isoformat(), None
+                task.attempts += 1
+                self._version += 1
+            try:
+                output = self.handler(task, agent_id)
+            except Exception as exc:  # noqa: BLE001 - every failure is recorded on the task
+                self._failed(index, task, exc)
+            else:
+                self._completed(index, task, output)
+            if self.checkpoint_interval <= 0:
+                self._save()
+
+    def _completed(self, me: int, task: Task, output: str) -> None:
+        with self._cond:
+            task.status, task.output, task.error_msg = COMPLETED, output, None
+            task.completed_at = datetime.now().isoformat()
+            self.report.completed += 1
+            self._version += 1
+            self._outstanding -= 1
+            for child in self._dependents.pop(task.task_id, []):
+                if child not in self._waiting_on:
+                    # Abandoned when another of its dependencies failed.
+                    continue
+                self._waiting_on[child] -= 1
+                if self._waiting_on[child] == 0:
+                    self._deques[me].append(child)
+            self._cond.notify_all()
+
+    def _failed(self, me: int, task: Task, exc: Exception) -> None:
+        with self._cond:
+            task.error_msg = f"{type(exc).__name__}: {exc}"
+            task.completed_at = datetime.now().isoformat()
+            self._version += 1
+            if isinstance(exc, PermanentModelError) or task.attempts >= self.max_attempts:
+                task.status = FAILED
+                self.report.failed += 1
+                self._outstanding -= 1
+                self._outstanding -= self._abandon(task.task_id)
+            else:
+                task.status = PENDING
+                self.report.retried += 1
+                self._seq += 1
+                due = time.monotonic() + retry_delay(task.error_msg, task.attempts, self.backoff)
+                heapq.heappush(self._delayed, (due, self._seq, task.task_id))
+            self._cond.notify_all()
+
+    def _abandon(self, task_id: str) -> int:
+        """Drop every task downstream of a failed one; return how many."""
+        dropped = 0
+        for child in self._dependents.pop(task_id, []):
+            if self.tasks[child].status == PENDING and self._waiting_on.pop(child, None) is not None:
+                self.tasks[child].error_msg = f"blocked by {task_id}"
+                dropped += 1 + self._abandon(child)
+        return dropped
+
+    def _flusher(self) -> None:
+        while not self._finished.wait(self.checkpoint_interval):
+            self._save()
+
+    def _save(self) -> None:
+        if self.checkpoint is None:
+            return
+        with self._cond:
+            if self._saved_version == self._version and self.checkpoint.path.exists():
+                return
+            version = self._saved_version = self._version
+            snapshot = [Task(**asdict(t)) for t in self.tasks.values()]
+        self.checkpoint.save(snapshot, version)
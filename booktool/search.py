@@ -0,0 +1,269 @@
+"""Full-text and code-block search across every manuscript in the repository.
+
+The index covers every Markdown file except the derived ``*_完整.md`` parts,
+so all three books (and the outlines and companion READMEs) are searchable.
+Text is tokenized per line: runs of Latin letters/digits become lower-cased
+words and runs of CJK characters become overlapping bigrams, which is the
+usual way to index Chinese without a dictionary. Every line also records
+whether it sits inside a fenced code block and the block's language.
+
+The index is a SQLite file at ``<repo>/.booktool/search.sqlite3``. Updates
+compare each file's ``(size, mtime_ns)`` with the stored key and only
+re-tokenize files that changed. A query intersects the postings of its
+tokens to candidate lines, then checks the literal query text against those
+lines, so ``~/.openclaw/openclaw.json`` matches exactly that string.
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .book import FRONT_MATTER_DELIM, PART_SUFFIX, REPO_ROOT, STATE_DIR, parse_front_matter_lines
+from .fsutil import stat_key
+
+INDEX_NAME = "search.sqlite3"
+_CJK = r"㐀-䶿一-鿿豈-﫿"
+_TOKEN_RE = re.compile(rf"[A-Za-z0-9_]+|[{_CJK}]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+_FENCE_RE = re.compile(r"^\s*(```+|~~~+)\s*([\w+#.-]*)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    section_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lines (
+    doc INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    lang TEXT,
+    text TEXT NOT NULL,
+    PRIMARY KEY (doc, line)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    PRIMARY KEY (term, doc, line)
+) WITHOUT ROWID;
+"""
+
+
+def tokenize(text: str) -> set[str]:
+    """Lower-cased Latin words plus CJK bigrams (a lone CJK character stays a unigram)."""
+    terms = set()
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        if _CJK_RE.match(token):
+            if len(token) == 1:
+                terms.add(token)
+            terms.update(token[i : i + 2] for i in range(len(token) - 1))
+        else:
+            terms.add(token.lower())
+    return terms
+
+
+def iter_documents(root: Path = REPO_ROOT):
+    for path in sorted(root.rglob("*.md")):
+        rel = path.relative_to(root)
+        if any(part.startswith(".") for part in rel.parts) or path.name.endswith(PART_SUFFIX):
+            continue
+        yield rel.as_posix(), path
+
+
+def scan_lines(path: Path) -> tuple[str, list[tuple[int, str | None, str]]]:
+    """Return ``(section_id, [(line_no, code_lang_or_None, text), ...])``.
+
+    Code-block lines carry their fence language (``""`` when the fence has
+    none); prose lines carry ``None``. Front matter is not indexed.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        raw = fh.read().split("\n")
+    start, meta = 0, {}
+    if raw and raw[0] == FRONT_MATTER_DELIM:
+        for i in range(1, len(raw)):
+            if raw[i] == FRONT_MATTER_DELIM:
+                meta = parse_front_matter_lines(raw[1:i])
+                start = i + 1
+                break
+    lines = []
+    lang: str | None = None
+    for i in range(start, len(raw)):
+        text = raw[i]
+        fence = _FENCE_RE.match(text)
+        if fence:
+            lang = fence.group(2).lower() if lang is None else None
+            continue
+        if text.strip():
+            lines.append((i + 1, lang, text))
+    return str(meta.get("section_id", "")), lines
+
+
+@dataclass
+class Hit:
+    path: str
+    section_id: str
+    line: int
+    lang: str | None
+    text: str
+
+
+class SearchIndex:
+    def __init__(self, path: Path | None = None, root: Path = REPO_ROOT):
+        self.root = root
+        self.path = path or root / STATE_DIR / INDEX_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def update(self) -> tuple[int, int]:
+        """Re-index changed files and drop deleted ones; return ``(indexed, removed)``."""
+        known = {path: (doc, size, mtime) for doc, path, size, mtime in self._db.execute(
+            "SELECT id, path, size, mtime_ns FROM docs"
+        )}
+        seen, indexed = set(), 0
+        with self._db:
+            for rel, path in iter_documents(self.root):
+                seen.add(rel)
+                key = stat_key(path)
+                old = known.get(rel)
+                if old and (old[1], old[2]) == key:
+                    continue
+                self._index(rel, path, key, old[0] if old else None)
+                indexed += 1
+            removed = [known[rel][0] for rel in set(known) - seen]
+            for doc in removed:
+                self._drop(doc)
+                self._db.execute("DELETE FROM docs WHERE id = ?", (doc,))
+        return indexed, len(removed)
+
+    def _drop(self, doc: int) -> None:
+        self._db.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        self._db.execute("DELETE FROM lines WHERE doc = ?", (doc,))
+
+    def _index(self, rel: str, path: Path, key: tuple[int, int], doc: int | None) -> None:
+        section_id, lines = scan_lines(path)
+        if doc is None:
+            doc = self._db.execute(
+                "INSERT INTO docs(path, section_id, size, mtime_ns) VALUES (?, ?, ?, ?)", (rel, section_id, *key)
+            ).lastrowid
+        else:
+            self._drop(doc)
+            self._db.execute(
+                "UPDATE docs SET section_id = ?, size = ?, mtime_ns = ? WHERE id = ?", (section_id, *key, doc)
+            )
+        self._db.executemany("INSERT INTO lines VALUES (?, ?, ?, ?)", ((doc, n, lang, text) for n, lang, text in lines))
+        self._db.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?)",
+            ((term, doc, n) for n, lang, text in lines for term in tokenize(text) | _lang_terms(lang)),
+        )
+
+    def search(
+        self,
+        query: str,
+        lang: str | None = None,
+        code: bool | None = None,
+        path_prefix: str = "",
+        limit: int = 50,
+    ) -> list[Hit]:
+        """Lines containing ``query``.
+
+        ``code`` True/False restricts hits to code/prose lines and ``lang`` to
+        code blocks of one language, in which case ``query`` may be empty.
+        """
+        # A single CJK character only has postings where it stood alone, so match it literally instead.
+        terms = [t for t in tokenize(query) if not (len(t) == 1 and _CJK_RE.match(t))]
+        if lang:
+            terms.append(f"\x00lang:{lang.lower()}")
+            code = True
+        if not terms:
+            return self._scan(query, code, path_prefix, limit) if query.strip() else []
+        # Intersect the rarest postings first.
+        counts = {t: self._db.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (t,)).fetchone()[0] for t in terms}
+        terms.sort(key=counts.__getitem__)
+        where = " AND ".join(
+            ["l.doc = p0.doc", "l.line = p0.line", "d.id = l.doc"]
+            + [f"EXISTS (SELECT 1 FROM postings p{i} WHERE p{i}.term = ? AND p{i}.doc = p0.doc AND p{i}.line = p0.line)"
+               for i in range(1, len(terms))]
+        )
+        sql = (
+            "SELECT d.path, d.section_id, l.line, l.lang, l.text FROM postings p0, lines l, docs d "
+            f"WHERE p0.term = ? AND {where} ORDER BY d.path, l.line"
+        )
+        needle = query.strip().lower()
+        hits = []
+        for path, section_id, line, line_lang, text in self._db.execute(sql, terms):
+            if path_prefix and not path.startswith(path_prefix):
+                continue
+            if code is True and line_lang is None or code is False and line_lang is not None:
+                continue
+            if needle and needle not in text.lower():
+                continue
+            hits.append(Hit(path, section_id, line, line_lang, text))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def _scan(self, query: str, code: bool | None, path_prefix: str, limit: int) -> list[Hit]:
+        """Fallback for queries with no indexable term, such as a single character."""
+        sql = (
+            "SELECT d.path, d.section_id, l.line, l.lang, l.text FROM lines l JOIN docs d ON d.id = l.doc "
+            "WHERE instr(l.text, ?) AND d.path LIKE ? || '%'"
+        )
+        if code is not None:
+            sql += " AND l.lang IS NOT NULL" if code else " AND l.lang IS NULL"
+        sql += " ORDER BY d.path, l.line LIMIT ?"
+        return [Hit(*row) for row in self._db.execute(sql, (query.strip(), path_prefix, limit))]
+
+
+def _lang_terms(lang: str | None) -> set[str]:
+    # A pseudo-term that cannot collide with real tokens marks code lines by language.
+    return set() if lang is None else {f"\x00lang:{lang}"}
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("search", help="search prose and code blocks across all manuscripts")
+    parser.add_argument("query", nargs="?", default="", help="text to find (CJK, words, config keys, paths...)")
+    parser.add_argument("--lang", help="only code blocks fenced with this language (json, yaml, bash...)")
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("--code", action="store_true", help="only lines inside code blocks")
+    scope.add_argument("--prose", action="store_true", help="only lines outside code blocks")
+    parser.add_argument("--path", default="", help="only files whose repo path starts with this prefix")
+    parser.add_argument("--limit", type=int, default=50, help="maximum number of hits (default: 50)")
+    parser.add_argument("--no-update", action="store_true", help="query the index as is, without re-indexing")
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    started = time.perf_counter()
+    with SearchIndex() as index:
+        if not args.no_update:
+            indexed, removed = index.update()
+            if indexed or removed:
+                print(f"indexed {indexed} file(s), removed {removed}", file=sys.stderr)
+        code = True if args.code else False if args.prose else None
+        hits = index.search(args.query, args.lang, code, args.path, args.limit)
+    for hit in hits:
+        where = f"{hit.path}:{hit.line}"
+        tag = f" [{hit.section_id}]" if hit.section_id else ""
+        block = f" ({hit.lang or 'code'})" if hit.lang is not None else ""
+        print(f"{where}{tag}{block}: {hit.text.strip()}")
+    print(f"{len(hits)} hit(s) in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0 if hits else 1
@@ -0,0 +1,104 @@
+"""Per-section statistics: front matter and a CJK-aware word count.
+
+Scanning a section reads its front-matter block and then streams the body
+line by line, so memory stays flat no matter how long a draft gets. Results
+are kept in ``.booktool/stats.json`` keyed by the file's ``(size, mtime_ns)``;
+a refresh only re-scans sections whose key changed.
+
+Words are counted the way Chinese publishing counts 字: every CJK ideograph is
+one word and every run of Latin letters or digits is one word. Punctuation and
+Markdown markup do not count.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from .book import FRONT_MATTER_DELIM, Book, Section, parse_front_matter_lines
+from .fsutil import atomic_write_json, load_json, stat_key
+
+INDEX_NAME = "stats.json"
+INDEX_VERSION = 1
+
+_WORD_RE = re.compile(
+    r"[㐀-䶿一-鿿豈-﫿\U00020000-\U0002fa1f]"  # one ideograph
+    r"|[A-Za-z0-9]+(?:['’.-][A-Za-z0-9]+)*"  # one Latin/number token
+)
+
+
+@dataclass
+class SectionStats:
+    rel: str
+    stat: tuple[int, int]
+    meta: dict[str, object] = field(default_factory=dict)
+    words: int = 0
+    lines: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SectionStats":
+        return cls(rel=data["rel"], stat=tuple(data["stat"]), meta=data["meta"], words=data["words"], lines=data["lines"])
+
+
+def count_words(text: str) -> int:
+    return sum(1 for _ in _WORD_RE.finditer(text))
+
+
+def scan_section(path: Path) -> tuple[dict[str, object], int, int]:
+    """Return ``(front_matter, words, body_lines)`` in a single streaming pass."""
+    meta: dict[str, object] = {}
+    words = lines = 0
+    with open(path, "r", encoding="utf-8") as fh:
+        first = fh.readline()
+        if first.rstrip("\n") == FRONT_MATTER_DELIM:
+            block = []
+            for line in fh:
+                if line.rstrip("\n") == FRONT_MATTER_DELIM:
+                    break
+                block.append(line)
+            meta = parse_front_matter_lines(block)
+        else:
+            words += count_words(first)
+            lines += 1
+        for line in fh:
+            words += count_words(line)
+            lines += 1
+    return meta, words, lines
+
+
+class StatsIndex:
+    """Persistent ``rel -> SectionStats`` map for one book."""
+
+    def __init__(self, book: Book):
+        self.book = book
+        self.path = book.state_dir / INDEX_NAME
+        data = load_json(self.path, {})
+        entries = data.get("sections", {}) if data.get("version") == INDEX_VERSION else {}
+        self.entries: dict[str, SectionStats] = {rel: SectionStats.from_dict(e) for rel, e in entries.items()}
+        self.rescanned: list[str] = []
+
+    def get(self, section: Section) -> SectionStats:
+        key = stat_key(section.path)
+        entry = self.entries.get(section.rel)
+        if entry is None or entry.stat != key:
+            meta, words, lines = scan_section(section.path)
+            entry = SectionStats(rel=section.rel, stat=key, meta=meta, words=words, lines=lines)
+            self.entries[section.rel] = entry
+            self.rescanned.append(section.rel)
+        return entry
+
+    def refresh(self) -> dict[str, SectionStats]:
+        """Bring every section up to date and persist the index if anything moved."""
+        current = {section.rel: self.get(section) for section in self.book.sections}
+        removed = set(self.entries) - set(current)
+        self.entries = current
+        if self.rescanned or removed or not self.path.exists():
+            self.save()
+        return current
+
+    def save(self) -> None:
+        atomic_write_json(
+            self.path,
+            {"version": INDEX_VERSION, "sections": {rel: asdict(e) for rel, e in self.entries.items()}},
+        )
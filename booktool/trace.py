@@ -0,0 +1,349 @@
+"""Structured timing spans for the pipeline stages.
+
+``with span("export.merge", book=...):`` records the wall time of the block,
+its peak RSS, the bytes the process read and wrote, and any counters added
+with :func:`count` while it was open (the pipeline adds prompt, completion
+and cached token counts; counters also add up into the enclosing spans).
+
+Each closed span is appended as one JSON line to
+``<repo>/.booktool/trace.jsonl``; set ``BOOKTOOL_TRACE`` to another path, or
+to ``off`` to disable tracing. Every command run through the CLI is one span
+with the stage spans nested below it, and all spans of an invocation share a
+run id. ``python -m booktool trace`` summarizes the file. Once the file grows
+past ``BOOKTOOL_TRACE_MAX_BYTES`` (8 MiB by default) it is renamed to
+``trace.jsonl.1``, replacing the previous one, so tracing keeps at most twice
+that on disk; the summary reads both and ``trace clear`` deletes both.
+
+Peak RSS is per span on Linux: the kernel's high-water mark is reset through
+``/proc/self/clear_refs`` when a span opens. Elsewhere it falls back to the
+process-lifetime peak from :func:`resource.getrusage`. Bytes come from
+``/proc/self/io`` (``rchar``/``wchar``) and are left out where that file does
+not exist. Worker processes are covered by ``children_peak_rss``; spans opened
+on worker threads record duration and counters only, since memory and I/O
+are per process.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .book import REPO_ROOT, STATE_DIR
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+TRACE_ENV = "BOOKTOOL_TRACE"
+TRACE_NAME = "trace.jsonl"
+MAX_BYTES_ENV = "BOOKTOOL_TRACE_MAX_BYTES"
+MAX_BYTES = 8 * 2**20
+RUN_ID = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+_local = threading.local()
+_main_stack: list["Span"] = []
+_lock = threading.Lock()
+_captures: list[list[dict]] = []
+_can_reset_peak = sys.platform.startswith("linux")
+
+
+@dataclass
+class Span:
+    name: str
+    attrs: dict[str, object]
+    parent: "Span | None" = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    start: float = field(default_factory=time.time)
+    duration: float = 0.0
+    peak_rss: int | None = None
+    children_peak_rss: int | None = None
+    bytes_read: int | None = None
+    bytes_written: int | None = None
+    counters: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    # Highest RSS seen by nested spans, which reset the kernel's high-water mark.
+    _nested_peak: int = 0
+
+    def record(self) -> dict:
+        data = {
+            "run": RUN_ID,
+            "id": self.id,
+            "parent": self.parent.id if self.parent else None,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+        }
+        for key in ("peak_rss", "children_peak_rss", "bytes_read", "bytes_written"):
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        data.update(self.counters)
+        if self.attrs:
+            data["attrs"] = self.attrs
+        return data
+
+
+def trace_path() -> Path | None:
+    value = os.environ.get(TRACE_ENV, "")
+    if value.lower() in ("off", "0", "false", "no"):
+        return None
+    return Path(value) if value else REPO_ROOT / STATE_DIR / TRACE_NAME
+
+
+def rotated_path(path: Path) -> Path:
+    return path.with_name(path.name + ".1")
+
+
+def max_bytes() -> int:
+    try:
+        return int(os.environ.get(MAX_BYTES_ENV, MAX_BYTES))
+    except ValueError:
+        return MAX_BYTES
+
+
+def _stack() -> list[Span]:
+    if threading.current_thread() is threading.main_thread():
+        return _main_stack
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def current() -> Span | None:
+    """Innermost open span of this thread, else of the main thread."""
+    stack = _stack()
+    if stack:
+        return stack[-1]
+    return _main_stack[-1] if _main_stack else None
+
+
+def _peak_rss() -> int | None:
+    try:
+        with open("/proc/self/status", "rb") as fh:
+            for line in fh:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _children_peak_rss() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_peak() -> None:
+    global _can_reset_peak
+    if not _can_reset_peak:
+        return
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        _can_reset_peak = False
+
+
+def _io() -> tuple[int, int] | None:
+    try:
+        with open("/proc/self/io", "rb") as fh:
+            fields = dict(line.split(b":") for line in fh if b":" in line)
+        return int(fields[b"rchar"]), int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block; nested spans become children of the enclosing one."""
+    stack = _stack()
+    parent = current()
+    measured = stack is _main_stack
+    s = Span(name, attrs, parent)
+    if measured:
+        if parent is not None:
+            parent._nested_peak = max(parent._nested_peak, _peak_rss() or 0)
+        _reset_peak()
+        io_before = _io()
+        children_before = _children_peak_rss()
+    stack.append(s)
+    started = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.duration = time.perf_counter() - started
+        stack.pop()
+        if measured:
+            s.peak_rss = max(_peak_rss() or 0, s._nested_peak) or None
+            if parent is not None:
+                parent._nested_peak = max(parent._nested_peak, s.peak_rss or 0)
+            io_after = _io()
+            if io_before and io_after:
+                s.bytes_read = io_after[0] - io_before[0]
+                s.bytes_written = io_after[1] - io_before[1]
+            children = _children_peak_rss()
+            if children > children_before:
+                s.children_peak_rss = children
+        if parent is not None and s.counters:
+            with _lock:
+                for key, value in s.counters.items():
+                    parent.counters[key] += value
+        _emit(s)
+
+
+def count(**deltas: int) -> None:
+    """Add to counters (``prompt_tokens=...``) of the innermost open span."""
+    s = current()
+    if s is None:
+        return
+    with _lock:
+        for key, value in deltas.items():
+            s.counters[key] += value
+
+
+def _emit(s: Span) -> None:
+    record = s.record()
+    with _lock:
+        for captured in _captures:
+            captured.append(record)
+        path = trace_path()
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+            full = fh.tell() >= max_bytes()
+        if full:
+            os.replace(path, rotated_path(path))
+
+
+@contextmanager
+def capture():
+    """Collect the records of every span closed inside the block."""
+    records: list[dict] = []
+    with _lock:
+        _captures.append(records)
+    try:
+        yield records
+    finally:
+        with _lock:
+            _captures.remove(records)
+
+
+def read_trace(path: Path):
+    """Records of ``path``, oldest first, starting with its rotated predecessor."""
+    for part in (rotated_path(path), path):
+        try:
+            with open(part, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            continue
+
+
+@dataclass
+class StageSummary:
+    name: str
+    durations: list[float] = field(default_factory=list)
+    peak_rss: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    counters: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def add(self, record: dict) -> None:
+        self.durations.append(record["duration"])
+        self.peak_rss = max(self.peak_rss, record.get("peak_rss", 0), record.get("children_peak_rss", 0))
+        self.bytes_read += record.get("bytes_read", 0)
+        self.bytes_written += record.get("bytes_written", 0)
+        for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            self.counters[key] += record.get(key, 0)
+
+    @property
+    def total(self) -> float:
+        return sum(self.durations)
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(records, prefix: str = "") -> list[StageSummary]:
+    stages: dict[str, StageSummary] = {}
+    for record in records:
+        if record["name"].startswith(prefix):
+            stages.setdefault(record["name"], StageSummary(record["name"])).add(record)
+    return sorted(stages.values(), key=lambda s: -s.total)
+
+
+def _last_runs(path: Path, runs: int) -> set[str]:
+    seen: dict[str, None] = {}
+    for record in read_trace(path):
+        seen[record["run"]] = None
+    return set(list(seen)[-runs:])
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("trace", help="summarize the per-stage trace spans")
+    parser.add_argument("--file", type=Path, help=f"trace file (default: ${TRACE_ENV} or .booktool/{TRACE_NAME})")
+    actions = parser.add_subparsers(dest="action")
+    summary = actions.add_parser("summary", help="time, memory, I/O and tokens per span name (the default)")
+    summary.add_argument("--runs", type=int, help="only the last N runs")
+    summary.add_argument("--name", default="", help="only spans whose name starts with this")
+    actions.add_parser("runs", help="list recorded runs")
+    actions.add_parser("clear", help="delete the trace file and its rotated copy")
+    parser.set_defaults(func=_main, action="summary", runs=None, name="")
+
+
+def _mib(value: int) -> str:
+    return f"{value / 2**20:.1f}" if value else "-"
+
+
+def _main(args) -> int:
+    path = args.file or trace_path()
+    if path is None:
+        print(f"tracing is disabled (${TRACE_ENV}=off); pass --file", file=sys.stderr)
+        return 1
+    if args.action == "clear":
+        path.unlink(missing_ok=True)
+        rotated_path(path).unlink(missing_ok=True)
+        return 0
+    if args.action == "runs":
+        for record in read_trace(path):
+            if record["parent"] is None:
+                started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["start"]))
+                command = record.get("attrs", {}).get("argv") or record["name"]
+                print(f"{record['run']}  {started}  {record['duration']:8.2f} s  {command}")
+        return 0
+    runs = _last_runs(path, args.runs) if args.runs else None
+    records = (r for r in read_trace(path) if runs is None or r["run"] in runs)
+    stages = summarize(records, args.name)
+    if not stages:
+        print(f"no spans in {path}", file=sys.stderr)
+        return 1
+    print(
+        f"{'span':<28} {'count':>6} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'peak MiB':>9} "
+        f"{'read MiB':>9} {'write MiB':>9} {'tokens in':>10} {'tokens out':>10} {'cached':>8}"
+    )
+    for s in stages:
+        print(
+            f"{s.name:<28} {len(s.durations):>6} {s.total:>9.2f} {s.total / len(s.durations) * 1000:>9.1f} "
+            f"{s.percentile(0.95) * 1000:>9.1f} {_mib(s.peak_rss):>9} {_mib(s.bytes_read):>9} "
+            f"{_mib(s.bytes_written):>9} {s.counters['prompt_tokens']:>10} {s.counters['completion_tokens']:>10} "
+            f"{s.counters['cached_tokens']:>8}"
+        )
+    return 0
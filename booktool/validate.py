@@ -0,0 +1,320 @@
+"""Syntax validation of the fenced code blocks in every section.
+
+Blocks are checked according to their fence language:
+
+* ``json`` — :func:`json.loads` (``jsonc``/``json5`` after stripping comments);
+* ``yaml``/``yml`` — ``yaml.safe_load_all`` when PyYAML is installed;
+* ``python``/``py`` — :func:`compile`;
+* ``bash``/``sh``/``shell``/``zsh`` — ``shellcheck`` when it is on ``PATH``,
+  otherwise ``bash -n``; leading ``$ `` prompts are stripped first.
+
+Other languages are counted but not checked. Besides the sections of every
+book, Markdown files that belong to no book -- the published book's companion
+READMEs, which have no ``progress.json`` -- are checked too, found the same way
+:mod:`booktool.search` finds them. Checks run in a process pool; results are
+cached in ``.booktool/validate.json`` (per book, and at the repo root for the
+loose files) by a hash of the checker and the block text, so only new or
+edited snippets are validated again. The cache also records which files each
+result came from: a run drops only the files under the directories it covers,
+so validating one loose directory keeps the results of the others.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .book import REPO_ROOT, STATE_DIR, Book, find_books, load_book, split_front_matter
+from .fsutil import atomic_write_json, load_json, sha1_bytes
+from .search import iter_documents
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - optional dependency
+    yaml = None
+
+CACHE_NAME = "validate.json"
+CACHE_VERSION = 2
+
+_FENCE_RE = re.compile(r"^(\s*)(`{3,}|~{3,})\s*([\w+#.-]*)")
+_PROMPT_RE = re.compile(r"^\s*\$ ", re.M)
+_JSONC_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', re.S)
+
+LANGUAGES = {
+    "json": "json",
+    "jsonc": "jsonc",
+    "json5": "jsonc",
+    "yaml": "yaml",
+    "yml": "yaml",
+    "python": "python",
+    "py": "python",
+    "bash": "shell",
+    "sh": "shell",
+    "shell": "shell",
+    "zsh": "shell",
+}
+
+
+@dataclass
+class CodeBlock:
+    path: str
+    line: int
+    lang: str
+    code: str
+
+
+@dataclass
+class BlockResult:
+    block: CodeBlock
+    ok: bool | None
+    message: str = ""
+
+
+@dataclass
+class SectionReport:
+    path: str
+    results: list[BlockResult] = field(default_factory=list)
+
+    @property
+    def failures(self) -> list[BlockResult]:
+        return [r for r in self.results if r.ok is False]
+
+
+def extract_code_blocks(text: str, path: str = "", first_line: int = 1) -> list[CodeBlock]:
+    """Fenced blocks in ``text``; ``line`` is the 1-based line of the opening fence."""
+    blocks = []
+    opener = None
+    for lineno, line in enumerate(text.split("\n"), first_line):
+        fence = _FENCE_RE.match(line)
+        if opener is None:
+            if fence:
+                opener, start, lang, body = fence.group(2), lineno, fence.group(3).lower(), []
+            continue
+        if fence and fence.group(2)[0] == opener[0] and len(fence.group(2)) >= len(opener) and not fence.group(3):
+            blocks.append(CodeBlock(path, start, lang, "\n".join(body)))
+            opener = None
+            continue
+        body.append(line)
+    return blocks
+
+
+def file_blocks(path: Path, rel: str) -> list[CodeBlock]:
+    text = path.read_text(encoding="utf-8")
+    front, body = split_front_matter(text)
+    offset = front.count("\n") + 4 if front else 1
+    return extract_code_blocks(body, rel, offset)
+
+
+def loose_documents(root: Path, books: list[Book]) -> list[tuple[str, Path]]:
+    """``(rel, path)`` of the Markdown under ``root`` that lies outside every book.
+
+    ``rel`` starts at the top-level directory, like the section names.
+    """
+    roots = [b.root for b in books]
+    base = root if root == REPO_ROOT else root.parent
+    return [
+        (path.relative_to(base).as_posix(), path)
+        for _, path in iter_documents(root)
+        if not any(path.is_relative_to(r) for r in roots)
+    ]
+
+
+def checker_for(lang: str) -> str | None:
+    """Name of the checker for ``lang``, including which tool backs it."""
+    kind = LANGUAGES.get(lang)
+    if kind == "yaml" and yaml is None:
+        return None
+    if kind == "shell":
+        return "shellcheck" if shutil.which("shellcheck") else "bash-n" if shutil.which("bash") else None
+    return kind
+
+
+def check_block(checker: str, code: str) -> tuple[bool, str]:
+    """Run one check; returns ``(ok, message)``. Executed in worker processes."""
+    try:
+        if checker == "json":
+            json.loads(code)
+        elif checker == "jsonc":
+            json.loads(_JSONC_COMMENT_RE.sub(lambda m: m.group(1) or "", code))
+        elif checker == "yaml":
+            list(yaml.safe_load_all(code))
+        elif checker == "python":
+            compile(code, "<block>", "exec")
+        elif checker in ("shellcheck", "bash-n"):
+            script = _PROMPT_RE.sub("", code)
+            cmd = ["shellcheck", "-s", "bash", "-S", "error", "-f", "gcc", "-"] if checker == "shellcheck" else ["bash", "-n"]
+            proc = subprocess.run(cmd, input=script, capture_output=True, text=True, timeout=30)
+            if proc.returncode:
+                return False, (proc.stdout + proc.stderr).strip().replace("bash: ", "", 1)
+    except SyntaxError as exc:
+        return False, f"line {exc.lineno}: {exc.msg}"
+    except Exception as exc:  # noqa: BLE001 - parser errors have no common base class
+        return False, " ".join(str(exc).split())
+    return True, ""
+
+
+def _check_batch(batch: list[tuple[str, str]]) -> list[tuple[bool, str]]:
+    return [check_block(checker, code) for checker, code in batch]
+
+
+class Validator:
+    """Checks one book's sections, or with ``documents`` a list of loose ``(rel, path)`` files.
+
+    ``roots`` are the directories the loose documents were collected from; a
+    book covers its own root.
+    """
+
+    def __init__(
+        self,
+        book: Book | None = None,
+        documents: list[tuple[str, Path]] | None = None,
+        roots: list[Path] | None = None,
+    ):
+        self.book = book
+        if book is not None:
+            documents = [(f"{book.name}/{section.rel}", section.path) for section in book.sections]
+            roots = [book.root]
+        self.documents = documents or []
+        self.roots = roots or []
+        state_dir = book.state_dir if book is not None else REPO_ROOT / STATE_DIR
+        self.cache_path = state_dir / CACHE_NAME
+        data = load_json(self.cache_path, {})
+        current = data.get("version") == CACHE_VERSION
+        self.cache: dict[str, list] = data.get("results", {}) if current else {}
+        # Result keys per source file, so a run can drop only what it covers.
+        self.files: dict[str, list[str]] = data.get("files", {}) if current else {}
+        self.checked = 0
+
+    def _prune(self, seen: dict[str, list[str]]) -> bool:
+        """Replace this run's files in ``self.files`` and drop results no file uses."""
+        files = {
+            name: keys
+            for name, keys in self.files.items()
+            if name not in seen
+            and Path(name).exists()
+            and not any(Path(name).is_relative_to(root) for root in self.roots)
+        }
+        files.update(seen)
+        live = {key for keys in files.values() for key in keys}
+        cache = {k: v for k, v in self.cache.items() if k in live}
+        changed = files != self.files or cache != self.cache
+        self.files, self.cache = files, cache
+        return changed
+
+    def run(self, pool: ProcessPoolExecutor | None = None, batch_size: int = 32) -> list[SectionReport]:
+        reports = []
+        todo: dict[str, tuple[str, str]] = {}
+        keyed = []
+        seen: dict[str, list[str]] = {}
+        for rel, path in self.documents:
+            report = SectionReport(rel)
+            keys = seen[path.as_posix()] = []
+            for block in file_blocks(path, rel):
+                checker = checker_for(block.lang)
+                key = sha1_bytes(f"{checker}\0{block.code}".encode("utf-8")) if checker else None
+                if key:
+                    keys.append(key)
+                    if key not in self.cache:
+                        todo[key] = (checker, block.code)
+                keyed.append((report, block, key))
+            reports.append(report)
+
+        if todo:
+            keys = list(todo)
+            batches = [keys[i : i + batch_size] for i in range(0, len(keys), batch_size)]
+            work = [[todo[k] for k in batch] for batch in batches]
+            results = pool.map(_check_batch, work) if pool else map(_check_batch, work)
+            for batch, outcome in zip(batches, results):
+                for key, (ok, message) in zip(batch, outcome):
+                    self.cache[key] = [ok, message]
+            self.checked = len(keys)
+
+        for report, block, key in keyed:
+            if key is None:
+                report.results.append(BlockResult(block, None))
+                continue
+            ok, message = self.cache[key]
+            report.results.append(BlockResult(block, ok, message))
+        if self._prune(seen) or todo or not self.cache_path.exists():
+            atomic_write_json(self.cache_path, {"version": CACHE_VERSION, "results": self.cache, "files": self.files})
+        return reports
+
+
+def register(subparsers) -> None:
+    parser = subparsers.add_parser("validate", help="syntax-check fenced code blocks in every section and README")
+    parser.add_argument(
+        "books", nargs="*",
+        help="book directories, or other directories whose Markdown to check (default: the whole repo)",
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="print the per-section report as JSON")
+    parser.add_argument("--all", action="store_true", help="list every section, not just those with failures")
+    parser.set_defaults(func=_main)
+
+
+def _main(args) -> int:
+    started = time.perf_counter()
+    reports: list[SectionReport] = []
+    checked = 0
+    if args.books:
+        dirs = [Path(p).resolve() for p in args.books]
+        books = [load_book(d) for d in dirs if (d / "progress.json").exists()]
+        roots = [d for d in dirs if not (d / "progress.json").exists()]
+    else:
+        books = find_books()
+        roots = [REPO_ROOT]
+    loose = [doc for d in roots for doc in loose_documents(d, books)]
+    validators = [Validator(book) for book in books]
+    if loose:
+        validators.append(Validator(documents=loose, roots=roots))
+    pool = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+    try:
+        for validator in validators:
+            reports += validator.run(pool)
+            checked += validator.checked
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    results = [r for report in reports for r in report.results]
+    failed = sum(1 for r in results if r.ok is False)
+    skipped = sum(1 for r in results if r.ok is None)
+    if args.json:
+        json.dump(
+            [
+                {
+                    "path": report.path,
+                    "blocks": len(report.results),
+                    "failures": [
+                        {"line": r.block.line, "lang": r.block.lang, "message": r.message} for r in report.failures
+                    ],
+                }
+                for report in reports
+                if args.all or report.failures
+            ],
+            sys.stdout,
+            ensure_ascii=False,
+            indent=2,
+        )
+        print()
+    else:
+        for report in reports:
+            if not (args.all or report.failures):
+                continue
+            print(f"{report.path}: {len(report.results)} block(s), {len(report.failures)} failed")
+            for r in report.failures:
+                print(f"  {r.block.line} [{r.block.lang}] {r.message}")
+    print(
+        f"{len(results)} block(s): {len(results) - failed - skipped} ok, {failed} failed, "
+        f"{skipped} unchecked; {checked} validated in {time.perf_counter() - started:.2f} s",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
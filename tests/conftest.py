@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path: Path, monkeypatch) -> Path:
+    """Send trace spans to a per-test file instead of the repo's ``.booktool/trace.jsonl``."""
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setenv("BOOKTOOL_TRACE", str(path))
+    return path
+
+
+def write_section(root: Path, part: str, name: str, body: str, **meta) -> Path:
+    """Write ``<root>/<part>/<name>.md`` with flat front matter."""
+    path = root / part / f"{name}.md"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    front = "".join(f"{key}: {value}\n" for key, value in meta.items())
+    path.write_text(f"---\n{front}---\n\n{body}", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def book_dir(tmp_path: Path) -> Path:
+    """A small book: a preface and two parts, with sections out of lexical order."""
+    root = tmp_path / "测试书"
+    root.mkdir()
+    (root / "progress.json").write_text(json.dumps({"sections": []}), encoding="utf-8")
+    write_section(root, "序章", "0.1_开篇", "# 开篇\n\n故事从这里开始。\n", section_id="0.1", status="draft")
+    for n in (1, 2, 10):
+        write_section(
+            root, "第一部分", f"1.{n}_第{n}节", f"# 第{n}节\n\n正文 {n}。\n\n```bash\necho {n}\n```\n",
+            section_id=f"1.{n}", status="draft", target_words=1000,
+        )
+    write_section(root, "第二部分", "2.1_收尾", "# 收尾\n\n- 要点一\n- 要点二\n", section_id="2.1", status="outline")
+    return root
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+
+from booktool.assemble import AssemblyReport, Assembler, assemble_books
+from booktool.book import load_book
+
+
+def _outputs(book) -> dict[str, bytes]:
+    return {part: book.part_output(part).read_bytes() for part in book.parts()}
+
+
+def _edit(path, old: str, new: str) -> None:
+    path.write_text(path.read_text(encoding="utf-8").replace(old, new), encoding="utf-8")
+
+
+def test_first_run_writes_every_part(book_dir):
+    book = load_book(book_dir)
+    report = assemble_books([book])
+    assert len(report.written) == 3 and not report.protected
+    text = book.part_output("第一部分").read_text(encoding="utf-8")
+    assert text.startswith("# 第一部分\n\n---\n\n# 第1节")
+    assert "status:" not in text
+    assert text.index("第2节") < text.index("第10节")
+
+
+def test_unchanged_run_skips_everything(book_dir):
+    book = load_book(book_dir)
+    assemble_books([book])
+    report = assemble_books([book])
+    assert report.written == [] and len(report.skipped) == 3
+    assert report.rebuilt_sections == 0
+
+
+def test_splice_equals_full_rebuild(book_dir):
+    book = load_book(book_dir)
+    assemble_books([book])
+    first = book.sections[1].path
+    _edit(first, "正文 1。", "正文 1，改写后更长的一段内容。")
+    _edit(book.sections[3].path, "正文 10。", "短。")
+
+    report = assemble_books([book])
+    assert report.rebuilt_sections == 2
+    spliced = _outputs(book)
+
+    forced = assemble_books([book], force=True)
+    assert forced.written == []
+    assert _outputs(book) == spliced
+
+
+def test_touched_but_unchanged_section_is_reused(book_dir):
+    book = load_book(book_dir)
+    assemble_books([book])
+    path = book.sections[2].path
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    report = assemble_books([book])
+    assert report.rebuilt_sections == 0 and report.written == []
+
+
+def test_reordered_sections_rebuild_the_part(book_dir):
+    book = load_book(book_dir)
+    assemble_books([book])
+    book.sections[2].path.rename(book.sections[2].path.with_name("1.20_第2节.md"))
+    book = load_book(book_dir)
+    assemble_books([book])
+    text = book.part_output("第一部分").read_text(encoding="utf-8")
+    assert text.index("第10节") < text.index("第2节")
+
+
+def test_hand_written_part_file_is_protected(book_dir):
+    book = load_book(book_dir)
+    output = book.part_output("第一部分")
+    output.write_text("# 第一部分：手写标题\n\n## 只在这里的一章\n", encoding="utf-8")
+    report = Assembler(book).run(AssemblyReport())
+    assert report.protected == ["测试书/第一部分"]
+    assert output.read_text(encoding="utf-8") == "# 第一部分：手写标题\n\n## 只在这里的一章\n"
+
+    forced = Assembler(book, force=True).run(AssemblyReport())
+    assert "测试书/第一部分" in forced.written
+    # The hand-written title line is kept as the header.
+    assert output.read_text(encoding="utf-8").startswith("# 第一部分：手写标题\n\n---\n\n# 第1节")
+
+
+def test_output_edited_after_assembly_is_protected(book_dir):
+    book = load_book(book_dir)
+    assemble_books([book])
+    output = book.part_output("第二部分")
+    output.write_text(output.read_text(encoding="utf-8") + "\n手工补充\n", encoding="utf-8")
+    _edit(book.sections[-1].path, "要点二", "要点三")
+    report = assemble_books([book])
+    assert report.protected == ["测试书/第二部分"]
+    assert output.read_text(encoding="utf-8").endswith("手工补充\n")
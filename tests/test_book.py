@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from booktool.book import (
+    load_book,
+    parse_front_matter_lines,
+    part_sort_key,
+    section_sort_key,
+    split_front_matter,
+    update_front_matter,
+)
+
+
+def test_section_sort_key_orders_numerically():
+    ids = ["1.10", "附录A", "1.2", "0.1", "2.1", "1.1", "附录B", "10.1"]
+    assert sorted(ids, key=section_sort_key) == ["0.1", "1.1", "1.2", "1.10", "2.1", "10.1", "附录A", "附录B"]
+
+
+def test_part_sort_key_reading_order():
+    parts = ["附录", "第十部分", "终章", "第二部分", "序章", "第一章_认识Agent_Skill", "第九部分", "其他"]
+    assert sorted(parts, key=part_sort_key) == [
+        "序章", "第一章_认识Agent_Skill", "第二部分", "第九部分", "第十部分", "终章", "其他", "附录",
+    ]
+
+
+def test_load_book_orders_parts_and_sections(book_dir):
+    book = load_book(book_dir)
+    assert [s.rel for s in book.sections] == [
+        "序章/0.1_开篇.md",
+        "第一部分/1.1_第1节.md",
+        "第一部分/1.2_第2节.md",
+        "第一部分/1.10_第10节.md",
+        "第二部分/2.1_收尾.md",
+    ]
+
+
+def test_load_book_ignores_outputs_and_notes(book_dir):
+    (book_dir / "第一部分" / "第一部分_完整.md").write_text("# 第一部分\n", encoding="utf-8")
+    (book_dir / "第一部分" / "1.1_第1节_research.md").write_text("笔记\n", encoding="utf-8")
+    assert len(load_book(book_dir).sections) == 5
+
+
+def test_split_front_matter():
+    text = "---\ntitle: 标题\nstatus: draft\n---\n\n# 标题\n\n正文\n"
+    front, body = split_front_matter(text)
+    assert front == "title: 标题\nstatus: draft"
+    assert body == "\n# 标题\n\n正文\n"
+    assert split_front_matter("# 没有前言\n") == ("", "# 没有前言\n")
+    assert split_front_matter("---\n未闭合\n") == ("", "---\n未闭合\n")
+
+
+def test_update_front_matter_round_trip():
+    text = "---\nsection_id: 1.1\ntitle: 标题\nstatus: outline\n  nested: kept\n---\n\n# 标题\n\n正文\n"
+    updated = update_front_matter(text, {"status": "draft", "word_count": 120})
+    front, body = split_front_matter(updated)
+    assert body == split_front_matter(text)[1]
+    assert front.split("\n") == ["section_id: 1.1", "title: 标题", "status: draft", "  nested: kept", "word_count: 120"]
+    assert parse_front_matter_lines(front.split("\n")) == {
+        "section_id": "1.1", "title": "标题", "status": "draft", "word_count": 120,
+    }
+    assert update_front_matter(updated, {"status": "draft", "word_count": 120}) == updated
+
+
+def test_update_front_matter_adds_block():
+    updated = update_front_matter("# 标题\n", {"status": "outline"})
+    assert updated == "---\nstatus: outline\n---\n# 标题\n"
+    assert split_front_matter(updated) == ("status: outline", "# 标题\n")
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import itertools
+
+import pytest
+
+from booktool import cache as cache_mod
+from booktool.cache import ResponseCache, cache_key
+from booktool.llm import Completion, StubModel
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing ``time.time`` so LRU order does not depend on timer resolution."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(cache_mod.time, "time", lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    with ResponseCache(tmp_path / "cache.sqlite3", max_bytes=100) as c:
+        yield c
+
+
+def _completion(size: int) -> Completion:
+    return Completion(text="x" * size, prompt_tokens=1, completion_tokens=2)
+
+
+def test_cache_key_ignores_whitespace_noise():
+    assert cache_key("m", "标题\n\n\n\n正文  \n") == cache_key("m", "标题\n\n正文")
+    assert cache_key("m", "a", {"t": 0}) != cache_key("m", "a", {"t": 1})
+    assert cache_key("m", "a", outline="x") != cache_key("m", "a", outline="y")
+
+
+def test_cache_key_includes_model_options():
+    assert cache_key("stub", "a", options={"words": 30}) != cache_key("stub", "a", options={"words": 3000})
+    assert cache_key("stub", "a", options={}) == cache_key("stub", "a")
+
+
+def test_lru_eviction_keeps_recently_used(cache):
+    for key in ("a", "b", "c"):
+        cache.put(key, _completion(30))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("d", _completion(30))    # 120 bytes > 100: evict down to 90
+    assert cache.get("b") is None
+    assert [cache.get(k) is not None for k in ("a", "c", "d")] == [True, True, True]
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["bytes"] == 90 and stats["evictions"] == 1
+
+
+def test_eviction_goes_below_the_budget(cache):
+    for key in "abcde":
+        cache.put(key, _completion(20))
+    cache.put("f", _completion(20))  # 120 bytes: drop the oldest until <= 90
+    assert cache.stats()["bytes"] <= 90
+    assert cache.get("a") is None and cache.get("b") is None and cache.get("f") is not None
+
+
+def test_invalidate_by_path_or_id(cache):
+    cache.put("k1", _completion(5), section="第一部分/1.1_a.md", section_id="1.1")
+    cache.put("k2", _completion(5), section="第一部分/1.2_b.md", section_id="1.2")
+    cache.put("k3", _completion(5), section="第一部分/1.2_b.md", section_id="1.2")
+    assert cache.invalidate(["1.2"]) == 2
+    assert cache.invalidate(["第一部分/1.1_a.md"]) == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_complete_counts_hits_and_misses(tmp_path, clock):
+    model = StubModel()
+    with ResponseCache(tmp_path / "cache.sqlite3") as cache:
+        first = cache.complete(model, "《书》 1.1 标题\n请写。\n", section="a.md")
+        second = cache.complete(model, "《书》 1.1 标题\n请写。\n\n\n", section="a.md")
+        stats = cache.stats()
+    assert second == first
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["tokens_saved"] == first.prompt_tokens + first.completion_tokens
+
+
+def test_cache_persists_across_instances(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    with ResponseCache(path) as c:
+        c.put("k", _completion(3))
+    with ResponseCache(path) as c:
+        assert c.get("k").text == "xxx"
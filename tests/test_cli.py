@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def test_closed_stdout_exits_quietly(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    record = {"run": "r", "id": "x", "parent": None, "name": "assemble", "start": 0.0, "duration": 0.1}
+    trace.write_text((json.dumps(record) + "\n") * 20000, encoding="utf-8")
+    env = {**os.environ, "BOOKTOOL_TRACE": str(trace)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "booktool", "trace", "runs"],
+        cwd=REPO, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    proc.stdout.readline()
+    proc.stdout.close()
+    stderr = proc.stderr.read()
+    proc.stderr.close()
+    assert proc.wait() == 1
+    assert b"Traceback" not in stderr
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from conftest import write_section
+
+from booktool import outline as outline_mod
+from booktool.book import load_book
+from booktool.coverage import CoverageIndex
+
+OUTLINE = """# 测试书
+
+## 【第一部分】基础（3000字）
+
+### 1.1 安装部署
+
+- 安装步骤
+
+## 【第二部分】进阶（1000字）
+"""
+
+
+def _book(tmp_path: Path) -> Path:
+    root = tmp_path / "测试书"
+    root.mkdir()
+    (root / "progress.json").write_text(json.dumps({"sections": []}), encoding="utf-8")
+    (root / "测试书大纲.md").write_text(OUTLINE, encoding="utf-8")
+    write_section(root, "第一部分", "1.1_安装部署", "安装步骤如下。\n", section_id="1.1")
+    write_section(root, "第一部分", "1.2_版本历史", "一二三四五\n", section_id="1.2")
+    write_section(root, "第二部分", "2.1_安全模型", "六七八\n", section_id="2.1")
+    return root
+
+
+def test_unmatched_sections_roll_up_to_their_part(tmp_path: Path):
+    root = _book(tmp_path)
+
+    report = CoverageIndex(load_book(root)).report()
+
+    rows = {row.node.label: row for row in report.rows}
+    assert [s.section.rel for s in rows["1.1 安装部署"].sections] == ["第一部分/1.1_安装部署.md"]
+    assert [s.section.rel for s in rows["【第一部分】基础"].sections] == ["第一部分/1.2_版本历史.md"]
+    assert [s.section.rel for s in rows["【第二部分】进阶"].sections] == ["第二部分/2.1_安全模型.md"]
+    assert report.rows[0].words == report.words
+    assert [s.section.rel for s in report.unmatched] == ["第一部分/1.2_版本历史.md", "第二部分/2.1_安全模型.md"]
+
+
+def test_matches_are_cached_until_title_or_outline_changes(tmp_path: Path, monkeypatch):
+    root = _book(tmp_path)
+    matched = []
+    match_section = outline_mod.match_section
+    monkeypatch.setattr(
+        outline_mod, "match_section", lambda nodes, sid, title: matched.append(title) or match_section(nodes, sid, title)
+    )
+
+    CoverageIndex(load_book(root)).report()
+    assert len(matched) == 3
+    matched.clear()
+    report = CoverageIndex(load_book(root)).report()
+    assert matched == []
+    rows = {row.node.label: row for row in report.rows}
+    assert [s.section.rel for s in rows["1.1 安装部署"].sections] == ["第一部分/1.1_安装部署.md"]
+
+    write_section(root, "第一部分", "1.1_安装部署", "安装步骤如下。\n", section_id="1.1", title="安装与部署")
+    CoverageIndex(load_book(root)).report()
+    assert matched == ["安装与部署"]
+
+    matched.clear()
+    outline = root / "测试书大纲.md"
+    outline.write_text(OUTLINE.replace("进阶", "高级"), encoding="utf-8")
+    report = CoverageIndex(load_book(root)).report()
+    assert len(matched) == 3
+    assert "【第二部分】高级" in [row.node.label for row in report.rows]
+
+
+def test_sections_fall_back_to_the_chapter_of_their_number(tmp_path: Path):
+    root = _book(tmp_path)
+    (root / "测试书大纲.md").write_text(
+        OUTLINE.replace("### 1.1 安装部署", "### 第1章：上手（2000字）\n\n**1.1 安装部署**"), encoding="utf-8"
+    )
+    write_section(root, "第二部分", "3.1_未来展望", "九十\n", section_id="3.1")
+
+    report = CoverageIndex(load_book(root)).report()
+
+    rows = {row.node.label: row for row in report.rows}
+    chapter = rows["第1章：上手"]
+    assert chapter.node.chapter == "1" and chapter.node.number == ""
+    assert [s.section.rel for s in chapter.sections] == ["第一部分/1.2_版本历史.md"]
+    assert chapter.words == 5 + rows["1.1 安装部署"].words
+    assert [s.section.rel for s in report.unmatched] == ["第二部分/2.1_安全模型.md", "第二部分/3.1_未来展望.md"]
+    assert report.rows[0].words == report.words
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from booktool import dedup
+from booktool.assemble import assemble_books
+from booktool.book import load_book
+from booktool.dedup import NUM_BINS, SignatureStore, find_duplicates, lsh_params, minhash, normalize, similarity
+
+from conftest import write_section
+
+TEXT = (
+    "智能体在执行任务时会调用外部工具，每一次调用都应该有明确的输入和输出，"
+    "这样出错时才能快速定位问题所在。日志和追踪数据决定了你能否在事故发生后复盘。"
+)
+OTHER = (
+    "The gateway keeps one long-lived connection per messaging platform and "
+    "routes every inbound message to the agent that owns the conversation."
+)
+
+
+@pytest.fixture
+def store(tmp_path: Path):
+    store = SignatureStore(tmp_path / "dedup.sqlite3")
+    yield store
+    store.close()
+
+
+def test_similarity_separates_near_duplicates_from_unrelated_text():
+    base = minhash(normalize(TEXT))
+    assert len(base) == NUM_BINS
+    assert similarity(base, minhash(normalize(TEXT))) == 1.0
+    assert similarity(base, minhash(normalize(TEXT.replace("快速", "迅速")))) > 0.7
+    assert similarity(base, minhash(normalize(OTHER))) < 0.1
+
+
+def test_lsh_params_split_the_signature_below_the_threshold():
+    for threshold in (0.5, 0.7, 0.9):
+        bands, rows = lsh_params(threshold)
+        assert bands * rows == NUM_BINS
+        assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_near_duplicate_sections_cluster(book_dir: Path, store):
+    write_section(book_dir, "第二部分", "2.2_工具调用", f"# 工具调用\n\n{TEXT}\n", section_id="2.2")
+    write_section(book_dir, "第二部分", "2.3_调用工具", f"# 调用工具\n\n{TEXT.replace('快速', '迅速')}\n", section_id="2.3")
+    clusters = find_duplicates([load_book(book_dir)], store=store)
+    sections = [sorted(u.path for u in c.members) for c in clusters if c.kind == "section"]
+    assert sections == [["测试书/第二部分/2.2_工具调用.md", "测试书/第二部分/2.3_调用工具.md"]]
+    # The same paragraphs are part of the section cluster and not reported again.
+    assert not [c for c in clusters if c.kind == "paragraph"]
+
+
+def test_part_files_do_not_match_their_own_sections(book_dir: Path, store):
+    write_section(book_dir, "第二部分", "2.2_工具调用", f"# 工具调用\n\n{TEXT}\n", section_id="2.2")
+    assemble_books([load_book(book_dir)])
+    assert (book_dir / "第二部分" / "第二部分_完整.md").exists()
+    assert find_duplicates([load_book(book_dir)], store=store) == []
+
+
+def test_dense_duplicates_collapse_into_one_cluster(book_dir: Path, store, monkeypatch):
+    monkeypatch.setattr(dedup, "BUCKET_CAP", 3)
+    for n in range(12):
+        write_section(book_dir, "第三部分", f"3.{n + 1}_副本{n}", f"# 副本\n\n{TEXT}{n}\n", section_id=f"3.{n + 1}")
+    clusters = find_duplicates([load_book(book_dir)], store=store)
+    [cluster] = [c for c in clusters if c.kind == "section"]
+    assert len(cluster.members) == 12
+    # Units already in the cluster are never compared again.
+    assert len(cluster.pairs) == 11
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from booktool.book import load_book
+from booktool.export import Exporter
+
+
+@pytest.fixture
+def exported(book_dir: Path, tmp_path: Path):
+    out = tmp_path / "dist"
+    reports = Exporter([load_book(book_dir)], ["docx", "pdf"], out).run()
+    return out, {r.fmt: r for r in reports}
+
+
+def test_docx_parts_are_well_formed(exported):
+    out, reports = exported
+    assert reports["docx"].written and reports["docx"].rendered == 5
+    with zipfile.ZipFile(out / "测试书.docx") as zf:
+        names = zf.namelist()
+        assert "word/document.xml" in names and "[Content_Types].xml" in names
+        for name in names:
+            if name.endswith((".xml", ".rels")):
+                ET.fromstring(zf.read(name))
+        body = zf.read("word/document.xml").decode("utf-8")
+    assert "故事从这里开始。" in body and "echo 10" in body
+
+
+def test_pdf_xref_offsets_point_at_their_objects(exported):
+    out, reports = exported
+    data = (out / "测试书.pdf").read_bytes()
+    assert data.startswith(b"%PDF-") and data.endswith(b"%%EOF\n")
+    startxref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", data).group(1))
+    assert data[startxref:].startswith(b"xref\n")
+    count = int(re.match(rb"xref\n0 (\d+)\n", data[startxref:]).group(1))
+    entries = re.findall(rb"(\d{10}) 00000 n \n", data[startxref:])
+    assert len(entries) == count - 1
+    for num, offset in enumerate(entries, 1):
+        assert data[int(offset):].startswith(f"{num} 0 obj\n".encode("ascii"))
+    assert reports["pdf"].pages and data.count(b"/Type /Page ") == reports["pdf"].pages
+
+
+def test_second_run_renders_nothing_and_keeps_outputs(book_dir: Path, exported):
+    out, _ = exported
+    before = {p.name: (p.read_bytes(), p.stat().st_mtime_ns) for p in out.iterdir()}
+    reports = Exporter([load_book(book_dir)], ["docx", "pdf"], out).run()
+    assert [(r.rendered, r.written) for r in reports] == [(0, False), (0, False)]
+    assert {p.name: (p.read_bytes(), p.stat().st_mtime_ns) for p in out.iterdir()} == before
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from booktool.markdown import Span, join_lines, parse_blocks, parse_inline, plain_text
+
+
+def _kinds(blocks):
+    return [(b.kind, b.level, b.marker, b.text) for b in blocks]
+
+
+def test_fences_keep_blank_lines_and_only_close_on_a_bare_fence():
+    text = "前文\n```Python\nx = 1\n\n```json\ny = 2\n```\n~~~\n```\n~~~\n后文"
+    blocks = parse_blocks(text)
+    assert _kinds(blocks) == [
+        ("paragraph", 0, "", "前文"),
+        ("code", 0, "python", "x = 1\n\n```json\ny = 2"),
+        ("code", 0, "", "```"),
+        ("paragraph", 0, "", "后文"),
+    ]
+
+
+def test_unclosed_fence_runs_to_the_end():
+    assert _kinds(parse_blocks("```bash\necho hi\n")) == [("code", 0, "bash", "echo hi\n")]
+
+
+def test_nested_lists_keep_depth_and_markers():
+    text = "- 一\n  - 二\n    - 三\n      接着三\n  - 二b\n- 四\n\n1. 第一\n2) 第二"
+    assert _kinds(parse_blocks(text)) == [
+        ("item", 0, "•", "一"),
+        ("item", 1, "•", "二"),
+        ("item", 2, "•", "三接着三"),
+        ("item", 1, "•", "二b"),
+        ("item", 0, "•", "四"),
+        ("item", 0, "1.", "第一"),
+        ("item", 0, "2.", "第二"),
+    ]
+
+
+def test_tables_quotes_headings_and_rules():
+    text = "# 标题 #\n\n| 名称 | 说明 |\n|---|:-:|\n| a | x \\| y |\n| b |  |\n\n> 引用一\n> 引用二\n\n---"
+    blocks = parse_blocks(text)
+    assert _kinds(blocks)[0] == ("heading", 1, "", "标题")
+    assert blocks[1].kind == "table" and blocks[1].rows == [["名称", "说明"], ["a", "x | y"], ["b", ""]]
+    assert _kinds(blocks)[2:] == [("quote", 0, "", "引用一引用二"), ("rule", 0, "", "")]
+
+
+def test_a_pipe_line_without_separator_is_prose():
+    assert _kinds(parse_blocks("| 不是表格 |\n下一行")) == [("paragraph", 0, "", "| 不是表格 | 下一行")]
+
+
+def test_join_lines_only_spaces_between_non_cjk():
+    assert join_lines(["第一行", "第二行", "English", "words", "，中文"]) == "第一行第二行 English words ，中文"
+    assert join_lines(["OpenClaw", "是"]) == "OpenClaw 是"
+
+
+def test_parse_inline_spans():
+    spans = parse_inline("**粗体 `code`** 与 *斜体*，[链接](http://x) ![图](a.png) \\* <https://a.b>")
+    assert spans == [
+        Span("粗体 ", bold=True),
+        Span("code", bold=True, code=True),
+        Span(" 与 "),
+        Span("斜体", italic=True),
+        Span("，"),
+        Span("链接"),
+        Span(" "),
+        Span("[图]"),
+        Span(" "),
+        Span("*"),
+        Span(" "),
+        Span("https://a.b"),
+    ]
+    assert plain_text(parse_inline("a*b*c 2*3*4")) == "a*b*c 2*3*4"
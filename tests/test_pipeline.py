@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+
+from booktool.book import load_book, split_front_matter
+from booktool.cli import main
+from booktool.llm import PermanentModelError, StubModel
+from booktool.pipeline import HISTORY_KEY, RERUN_KEY, STATE_NAME, plan_tasks, run_pipeline
+from booktool.scheduler import Checkpoint
+
+from conftest import write_section
+
+
+class CountingModel(StubModel):
+    """Stub that counts calls per operation and can refuse prompts containing a marker."""
+
+    def __init__(self, refuse: str | None = None):
+        super().__init__()
+        self.calls: list[str] = []
+        self.refuse = refuse
+
+    def complete(self, prompt: str, **params):
+        self.calls.append(prompt.splitlines()[0])
+        if self.refuse and self.refuse in prompt.splitlines()[0]:
+            raise PermanentModelError("400 refused")
+        return super().complete(prompt, **params)
+
+
+def _body(path) -> str:
+    return split_front_matter(path.read_text(encoding="utf-8"))[1]
+
+
+def test_plan_follows_status(book_dir):
+    tasks = plan_tasks(load_book(book_dir))
+    ops = {}
+    for task in tasks:
+        ops.setdefault(task.path, []).append(task.operation)
+    assert ops["第二部分/2.1_收尾.md"] == ["research", "draft", "review"]
+    assert ops["第一部分/1.1_第1节.md"] == ["review"]
+
+
+def test_final_and_unknown_statuses_are_finished(book_dir):
+    write_section(book_dir, "第二部分", "2.2_定稿", "# 定稿\n\n正文。\n", section_id="2.2", status="final")
+    write_section(book_dir, "第二部分", "2.3_已读", "# 已读\n\n正文。\n", section_id="2.3", status="已读")
+    planned = {task.path for task in plan_tasks(load_book(book_dir))}
+    assert "第二部分/2.2_定稿.md" not in planned and "第二部分/2.3_已读.md" not in planned
+
+
+def test_draft_fills_empty_body_and_never_overwrites_text(book_dir):
+    empty = write_section(book_dir, "第二部分", "2.2_空白", "# 空白\n\n## 小节\n", section_id="2.2", status="outline")
+    book = load_book(book_dir)
+    full = book_dir / "第二部分" / "2.1_收尾.md"
+    before = _body(full)
+    report = run_pipeline(book, StubModel(), 2, backoff=0).report
+    assert report.failed == 0
+    assert _body(full) == before
+    assert (book_dir / "第二部分" / "2.1_draft.md").read_text(encoding="utf-8").startswith("# 收尾\n\n（stub")
+    assert "（stub" in _body(empty) and "status: reviewed" in empty.read_text(encoding="utf-8")
+    assert not (book_dir / "第二部分" / "2.2_draft.md").exists()
+    # Draft notes are not sections.
+    assert len(load_book(book_dir).sections) == 6
+
+
+def test_rerun_replays_research_and_review_only(book_dir):
+    book = load_book(book_dir)
+    bodies = {s.rel: _body(s.path) for s in book.sections}
+    model = CountingModel()
+    report = run_pipeline(book, model, 2, rerun=True, backoff=0).report
+    assert report.completed == 10
+    assert {s.rel: _body(s.path) for s in load_book(book_dir).sections} == bodies
+    assert not list(book_dir.rglob("*_draft.md"))
+    state = json.loads((book_dir / STATE_NAME).read_text(encoding="utf-8"))
+    assert RERUN_KEY not in state
+
+
+def test_rerun_never_lowers_status(book_dir):
+    reviewed = write_section(book_dir, "第二部分", "2.2_已审", "# 已审\n\n正文。\n", section_id="2.2", status="reviewed")
+    run_pipeline(load_book(book_dir), StubModel(), 2, operations=("research",), rerun=True, backoff=0)
+    assert "status: reviewed" in reviewed.read_text(encoding="utf-8")
+    assert "status: researched" in (book_dir / "第二部分" / "2.1_收尾.md").read_text(encoding="utf-8")
+
+
+def test_rerun_keeps_history_and_resumes(book_dir):
+    book = load_book(book_dir)
+    run_pipeline(book, StubModel(), 2, backoff=0)
+    checkpoint = Checkpoint(book_dir / STATE_NAME, 2)
+    first = {t.task_id: t for t in checkpoint.load().values()}
+    assert len(first) == 7
+
+    # A rerun that stops part-way: 1.2's research keeps failing.
+    model = CountingModel(refuse="1.2 ")
+    report = run_pipeline(load_book(book_dir), model, 2, rerun=True, backoff=0).report
+    assert report.failed == 1 and report.completed == 8
+    saved = checkpoint.load()
+    assert RERUN_KEY in checkpoint.meta
+    # Every record the rerun replaces moved to the history, including 1.2's.
+    assert sorted(r["task_id"] for r in checkpoint.meta[HISTORY_KEY]) == sorted(
+        t for t in first if not t.endswith(":draft")
+    )
+
+    # Resuming redoes only what the interrupted rerun did not finish.
+    model = CountingModel()
+    report = run_pipeline(load_book(book_dir), model, 2, rerun=True, backoff=0).report
+    assert report.completed == 2 and len(model.calls) == 2
+    assert all(" 1.2 " in call for call in model.calls)
+    checkpoint.load()
+    assert RERUN_KEY not in checkpoint.meta
+    assert len(checkpoint.meta[HISTORY_KEY]) == 6
+    # Draft records from the first run stay in the task list as history.
+    assert {t for t in first if t.endswith(":draft")} <= set(saved)
+
+
+def test_run_requires_a_model(book_dir, capsys):
+    assert main(["run", str(book_dir)]) == 2
+    assert "--model is required" in capsys.readouterr().err
+    assert not (book_dir / STATE_NAME).exists()
+
+
+def test_changing_model_options_misses_the_cache(book_dir):
+    notes = book_dir / "第二部分" / "2.1_research.md"
+    assert main(["run", str(book_dir), "--model", "stub:words=30", "--backoff", "0"]) == 0
+    short = notes.read_text(encoding="utf-8")
+    assert main(["run", str(book_dir), "--rerun", "--model", "stub:words=3000", "--backoff", "0"]) == 0
+    assert len(notes.read_text(encoding="utf-8")) > len(short) * 10
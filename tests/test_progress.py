@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import json
+
+from booktool.book import load_book
+from booktool.cli import main
+from booktool.progress import regenerate
+
+
+def _write(book_dir, progress: dict) -> None:
+    (book_dir / "progress.json").write_text(json.dumps(progress, ensure_ascii=False), encoding="utf-8")
+
+
+def _read(book_dir) -> dict:
+    return json.loads((book_dir / "progress.json").read_text(encoding="utf-8"))
+
+
+def test_word_count_schema_keeps_keys_and_order(book_dir):
+    _write(book_dir, {
+        "updated_at": "2026-01-01T00:00:00",
+        "total_sections": 1,
+        "sections": [
+            {"section_id": "1.1", "title": "旧标题", "chapter": "第一部分", "status": "outline",
+             "word_count": 0, "target_words": 500},
+        ],
+    })
+    changed, _ = regenerate(load_book(book_dir))
+    progress = _read(book_dir)
+    assert changed
+    assert list(progress) == ["updated_at", "total_sections", "sections"]
+    assert progress["updated_at"] != "2026-01-01T00:00:00" and progress["total_sections"] == 5
+    entry = next(e for e in progress["sections"] if e["section_id"] == "1.1")
+    assert list(entry) == ["section_id", "title", "chapter", "status", "word_count", "target_words"]
+    # Front matter wins over the old entry; titles fall back to it when the front matter has none.
+    assert entry["title"] == "旧标题" and entry["status"] == "draft" and entry["target_words"] == 1000
+    assert entry["word_count"] == 9
+
+
+def test_actual_words_schema_keeps_totals_and_file(book_dir):
+    _write(book_dir, {
+        "total_sections": 0,
+        "completed_sections": 0,
+        "total_words": 0,
+        "total_target": 0,
+        "sections": [
+            {"chapter": "序章", "file": "0.1_开篇.md", "section_id": "0.1", "title": "开篇", "status": "outline",
+             "target_words": 2000, "actual_words": 0},
+        ],
+    })
+    regenerate(load_book(book_dir))
+    progress = _read(book_dir)
+    assert list(progress) == ["total_sections", "completed_sections", "total_words", "total_target", "sections"]
+    sections = progress["sections"]
+    assert all(list(e) == ["chapter", "file", "section_id", "title", "status", "target_words", "actual_words"]
+               for e in sections)
+    assert sections[0]["file"] == "0.1_开篇.md" and sections[0]["target_words"] == 2000
+    assert progress["completed_sections"] == 4
+    assert progress["total_words"] == sum(e["actual_words"] for e in sections)
+    assert progress["total_target"] == 2000 + 3 * 1000
+
+
+def test_check_exits_1_when_stale_and_writes_nothing(book_dir, capsys):
+    before = (book_dir / "progress.json").read_bytes()
+    assert main(["progress", "--check", str(book_dir)]) == 1
+    assert "stale: 测试书/progress.json" in capsys.readouterr().out
+    assert (book_dir / "progress.json").read_bytes() == before
+    assert main(["progress", str(book_dir)]) == 0
+    assert main(["progress", "--check", str(book_dir)]) == 0
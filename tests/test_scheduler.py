@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from booktool.llm import ModelError, PermanentModelError
+from booktool.scheduler import COMPLETED, FAILED, PENDING, RUNNING, Checkpoint, Scheduler, Task, retry_delay
+
+
+def chain(section: str, operations=("research", "draft", "review")) -> list[Task]:
+    tasks, previous = [], None
+    for op in operations:
+        task = Task(f"{section}:{op}", section, op, path=section, depends_on=[previous] if previous else [])
+        tasks.append(task)
+        previous = task.task_id
+    return tasks
+
+
+class Recorder:
+    """Handler that records call order and fails on demand."""
+
+    def __init__(self, failures: dict[str, list[Exception]] | None = None):
+        self.calls: list[str] = []
+        self.failures = failures or {}
+        self._lock = threading.Lock()
+
+    def __call__(self, task: Task, agent_id: int) -> str:
+        with self._lock:
+            self.calls.append(task.task_id)
+            pending = self.failures.get(task.task_id)
+            if pending:
+                raise pending.pop(0)
+        return f"done {task.task_id}"
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_dependencies_run_in_order(workers):
+    tasks = [t for s in ("1.1", "1.2", "1.3", "2.1") for t in chain(s)]
+    handler = Recorder()
+    report = Scheduler(tasks, handler, max_workers=workers, backoff=0).run()
+    assert report.completed == 12 and report.failed == 0
+    assert sorted(handler.calls) == sorted(t.task_id for t in tasks)
+    position = {task_id: i for i, task_id in enumerate(handler.calls)}
+    for task in tasks:
+        for dep in task.depends_on:
+            assert position[dep] < position[task.task_id]
+    assert all(t.status == COMPLETED and t.output == f"done {t.task_id}" for t in tasks)
+
+
+def test_model_error_is_retried():
+    tasks = chain("1.1")
+    handler = Recorder({"1.1:draft": [ModelError("429 rate limited"), ModelError("timeout")]})
+    report = Scheduler(tasks, handler, max_workers=2, max_attempts=3, backoff=0).run()
+    assert report.completed == 3 and report.retried == 2 and report.failed == 0
+    assert handler.calls.count("1.1:draft") == 3
+    assert tasks[1].attempts == 3 and tasks[1].error_msg is None
+
+
+def test_task_fails_after_max_attempts_and_blocks_dependents():
+    tasks = chain("1.1") + chain("1.2")
+    handler = Recorder({"1.1:research": [ModelError("boom")] * 5})
+    report = Scheduler(tasks, handler, max_workers=2, max_attempts=2, backoff=0).run()
+    assert report.failed == 1 and report.retried == 1 and report.completed == 3
+    assert handler.calls.count("1.1:research") == 2
+    assert tasks[0].status == FAILED and tasks[0].error_msg == "ModelError: boom"
+    assert [t.status for t in tasks[1:3]] == [PENDING, PENDING]
+    assert tasks[2].error_msg == "blocked by 1.1:draft"
+    assert "1.1:draft" not in handler.calls
+
+
+def test_permanent_error_abandons_without_retry():
+    tasks = chain("1.1")
+    handler = Recorder({"1.1:research": [PermanentModelError("400 invalid request")]})
+    report = Scheduler(tasks, handler, max_workers=3, max_attempts=5, backoff=0).run()
+    assert handler.calls == ["1.1:research"]
+    assert report.failed == 1 and report.retried == 0 and report.completed == 0
+    assert tasks[1].error_msg == "blocked by 1.1:research"
+
+
+def test_failed_dependency_of_a_join_does_not_hang():
+    tasks = [
+        Task("a", "1", "research"),
+        Task("b", "2", "research"),
+        Task("c", "3", "draft", depends_on=["a", "b"]),
+        Task("d", "4", "draft", depends_on=["b"]),
+    ]
+    handler = Recorder({"a": [PermanentModelError("400 bad request")]})
+    result = []
+    runner = threading.Thread(target=lambda: result.append(Scheduler(tasks, handler, max_workers=1, backoff=0).run()))
+    runner.start()
+    runner.join(timeout=5)
+    assert not runner.is_alive()
+    [report] = result
+    assert report.completed == 2 and report.failed == 1
+    status = {t.task_id: t.status for t in tasks}
+    assert status == {"a": FAILED, "b": COMPLETED, "c": PENDING, "d": COMPLETED}
+    assert "c" not in handler.calls and tasks[2].error_msg == "blocked by a"
+
+
+def test_retry_delay_backs_off_and_caps(monkeypatch):
+    monkeypatch.setattr("booktool.scheduler.random.uniform", lambda a, b: b)
+    assert [retry_delay("timeout", n, 1.0) for n in (1, 2, 3)] == [1.0, 2.0, 4.0]
+    assert retry_delay("HTTP 429 Too Many Requests", 1, 1.0) == 4.0
+    assert retry_delay("timeout", 20, 1.0, cap=60.0) == 60.0
+    monkeypatch.setattr("booktool.scheduler.random.uniform", lambda a, b: a)
+    assert retry_delay("timeout", 2, 1.0) == 1.0
+
+
+def test_resume_from_partial_checkpoint(tmp_path):
+    path = tmp_path / ".batch_state.json"
+    tasks = chain("1.1") + chain("1.2")
+    # A run killed mid-way: 1.1 research and draft done, 1.1 review running, 1.2 research failed once.
+    tasks[0].status = tasks[1].status = COMPLETED
+    tasks[2].status, tasks[2].attempts, tasks[2].agent_id = RUNNING, 1, 3
+    tasks[3].status, tasks[3].attempts = FAILED, 3
+    Checkpoint(path, 2).save(tasks)
+
+    loaded = Checkpoint(path, 2).load()
+    assert loaded["1.1:review"].status == PENDING and loaded["1.1:review"].agent_id is None
+    assert loaded["1.2:research"].attempts == 0
+
+    handler = Recorder()
+    report = Scheduler(list(loaded.values()), handler, max_workers=2, checkpoint=Checkpoint(path, 2), backoff=0).run()
+    assert sorted(handler.calls) == ["1.1:review", "1.2:draft", "1.2:research", "1.2:review"]
+    assert report.completed == 4
+    assert all(t.status == COMPLETED for t in Checkpoint(path, 2).load().values())
+
+
+def test_checkpoint_written_after_every_attempt(tmp_path):
+    path = tmp_path / ".batch_state.json"
+    seen: list[int] = []
+
+    def handler(task: Task, agent_id: int) -> str:
+        done = [t for t in Checkpoint(path, 1).load().values() if t.status == COMPLETED] if path.exists() else []
+        seen.append(len(done))
+        return "ok"
+
+    Scheduler(chain("1.1"), handler, max_workers=1, checkpoint=Checkpoint(path, 1), checkpoint_interval=0).run()
+    assert seen == [0, 1, 2]
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from booktool import search
+from booktool.cli import main
+from booktool.search import SearchIndex, tokenize
+
+from conftest import write_section
+
+CONFIG = """# 配置
+
+编辑 `~/.openclaw/openclaw.json` 即可配置智能体。
+
+```json
+{"gateway": {"port": 18789}}
+```
+
+```bash
+cat ~/.openclaw/openclaw.json
+```
+
+鱼
+"""
+
+
+@pytest.fixture
+def corpus(tmp_path: Path) -> Path:
+    root = tmp_path / "repo"
+    write_section(root / "书", "第一部分", "1.1_配置", CONFIG, section_id="1.1")
+    write_section(root / "书", "第一部分", "1.2_入门", "智能体入门。\n", section_id="1.2")
+    (root / "书" / "第一部分" / "第一部分_完整.md").write_text("智能体\n", encoding="utf-8")
+    (root / ".booktool").mkdir()
+    (root / ".booktool" / "notes.md").write_text("智能体\n", encoding="utf-8")
+    return root
+
+
+@pytest.fixture
+def index(corpus: Path):
+    with SearchIndex(corpus / ".booktool" / "search.sqlite3", root=corpus) as index:
+        index.update()
+        yield index
+
+
+def test_tokenize_uses_cjk_bigrams():
+    assert tokenize("智能体 Agent_SDK") == {"智能", "能体", "agent_sdk"}
+    assert tokenize("鱼") == {"鱼"}
+
+
+def test_cjk_query_skips_parts_and_state_dirs(index):
+    hits = index.search("智能体")
+    assert [(h.path, h.section_id) for h in hits] == [("书/第一部分/1.1_配置.md", "1.1"), ("书/第一部分/1.2_入门.md", "1.2")]
+
+
+def test_bigrams_must_be_adjacent(index):
+    # 智能 and 能体 both occur on the 1.1 line, but "智体" does not.
+    assert index.search("智体") == []
+
+
+def test_single_character_falls_back_to_scan(index):
+    hits = index.search("鱼")
+    assert [(h.path, h.text) for h in hits] == [("书/第一部分/1.1_配置.md", "鱼")]
+    assert index.search("鱼", code=True) == []
+
+
+def test_literal_path_query(index):
+    hits = index.search("~/.openclaw/openclaw.json")
+    assert [(h.lang, "~/.openclaw/openclaw.json" in h.text) for h in hits] == [(None, True), ("bash", True)]
+    # Same tokens, different string.
+    assert index.search("openclaw/.openclaw") == []
+
+
+def test_lang_code_and_prose_filters(index):
+    assert [h.lang for h in index.search("", lang="json")] == ["json"]
+    assert [h.lang for h in index.search("openclaw", code=True)] == ["bash"]
+    assert [h.lang for h in index.search("openclaw", code=False)] == [None]
+    assert [h.text for h in index.search("gateway", lang="bash")] == []
+
+
+def test_cli_flags(corpus, monkeypatch, capsys):
+    monkeypatch.setattr(search, "SearchIndex", lambda: SearchIndex(corpus / ".booktool" / "search.sqlite3", root=corpus))
+    assert main(["search", "openclaw", "--prose"]) == 0
+    assert capsys.readouterr().out == "书/第一部分/1.1_配置.md:7 [1.1]: 编辑 `~/.openclaw/openclaw.json` 即可配置智能体。\n"
+    assert main(["search", "--lang", "json", "--no-update"]) == 0
+    assert capsys.readouterr().out.endswith('(json): {"gateway": {"port": 18789}}\n')
+    assert main(["search", "gateway", "--code", "--path", "其他/"]) == 1
+
+
+def test_update_reindexes_changed_and_drops_deleted(corpus, index):
+    assert index.update() == (0, 0)
+    write_section(corpus / "书", "第一部分", "1.2_入门", "改写后的入门。\n", section_id="1.2")
+    (corpus / "书" / "第一部分" / "1.1_配置.md").unlink()
+    assert index.update() == (1, 1)
+    assert index.search("openclaw") == []
+    assert index.search("智能体") == []
+    assert [h.path for h in index.search("改写")] == ["书/第一部分/1.2_入门.md"]
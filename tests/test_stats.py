@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from booktool.book import load_book
+from booktool.stats import StatsIndex, count_words, scan_section
+
+from conftest import write_section
+
+
+def test_count_words_cjk_and_latin():
+    assert count_words("智能体") == 3
+    assert count_words("OpenClaw 的 Gateway") == 3
+    # Punctuation and markup do not count; joined Latin/number tokens are one word.
+    assert count_words("**粗体**，`code`。") == 3
+    assert count_words("GPT-4o don't v3.14") == 3
+    assert count_words("--- | :-: | ##") == 0
+
+
+def test_scan_section_reads_front_matter_and_counts_body(book_dir):
+    meta, words, lines = scan_section(book_dir / "第一部分" / "1.2_第2节.md")
+    assert meta == {"section_id": "1.2", "status": "draft", "target_words": 1000}
+    # "第2节", "正文 2", then "bash" and "echo 2" from the fence.
+    assert words == 3 + 3 + 1 + 2
+    assert lines == 8
+
+
+def test_refresh_rescans_only_changed_files(book_dir):
+    book = load_book(book_dir)
+    first = StatsIndex(book)
+    first.refresh()
+    assert len(first.rescanned) == len(book.sections)
+
+    untouched = StatsIndex(book)
+    untouched.refresh()
+    assert untouched.rescanned == []
+
+    edited = write_section(book_dir, "第一部分", "1.1_第1节", "# 第1节\n\n更长的正文。\n", section_id="1.1")
+    assert edited.stat().st_size != first.entries["第一部分/1.1_第1节.md"].stat[0]
+    (book_dir / "第二部分" / "2.1_收尾.md").unlink()
+    index = StatsIndex(load_book(book_dir))
+    stats = index.refresh()
+    assert index.rescanned == ["第一部分/1.1_第1节.md"]
+    assert stats["第一部分/1.1_第1节.md"].words == 3 + 5
+    assert "第二部分/2.1_收尾.md" not in StatsIndex(book).entries
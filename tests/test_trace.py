@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from booktool import trace
+
+
+def test_trace_rotates_and_clear_removes_both(tmp_path: Path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setenv(trace.TRACE_ENV, str(path))
+    monkeypatch.setenv(trace.MAX_BYTES_ENV, "1000")
+
+    rotated = trace.rotated_path(path)
+    i = 0
+    while not (rotated.exists() and path.exists()):
+        with trace.span("stage", index=i):
+            pass
+        i += 1
+
+    assert rotated.stat().st_size >= 1000 > path.stat().st_size
+    indexes = [r["attrs"]["index"] for r in trace.read_trace(path)]
+    assert indexes == sorted(indexes) and indexes[-1] == i - 1
+
+    assert trace._main(argparse.Namespace(file=None, action="clear")) == 0
+    assert not path.exists() and not rotated.exists()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from booktool import validate
+from booktool.book import load_book
+from booktool.validate import Validator, extract_code_blocks, loose_documents
+
+
+def test_extract_code_blocks_reports_fence_lines():
+    blocks = extract_code_blocks("正文\n\n```python\nx = 1\n```\n\n```\nplain\n```\n", "a.md", first_line=5)
+    assert [(b.line, b.lang) for b in blocks] == [(7, "python"), (11, "")]
+
+
+def test_loose_documents_skip_books(tmp_path: Path, book_dir: Path):
+    readme = tmp_path / "已出版" / "companion" / "README.md"
+    readme.parent.mkdir(parents=True)
+    readme.write_text("# 配套代码\n\n```json\n{\"a\": 1}\n```\n", encoding="utf-8")
+    (tmp_path / "已出版" / ".booktool").mkdir()
+    (tmp_path / "已出版" / ".booktool" / "notes.md").write_text("```json\n{\n```\n", encoding="utf-8")
+    book = load_book(book_dir)
+
+    docs = loose_documents(tmp_path, [book])
+
+    assert [path for _, path in docs] == [readme]
+
+
+def test_validator_checks_loose_documents(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(validate, "REPO_ROOT", tmp_path)
+    root = tmp_path / "已出版"
+    (root / "a").mkdir(parents=True)
+    (root / "a" / "README.md").write_text("```json\n{\"ok\": true}\n```\n\n```json\n{bad}\n```\n", encoding="utf-8")
+
+    validator = Validator(documents=loose_documents(root, []))
+    [report] = validator.run()
+
+    assert report.path == "已出版/a/README.md"
+    assert (len(report.results), len(report.failures)) == (2, 1)
+    assert (tmp_path / ".booktool" / "validate.json").exists()
+
+
+def test_validating_one_directory_keeps_the_cache_of_another(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(validate, "REPO_ROOT", tmp_path)
+    root = tmp_path / "已出版"
+    for name, code in [("a", '{"a": 1}'), ("b", '{"b": 2}')]:
+        (root / name).mkdir(parents=True)
+        (root / name / "README.md").write_text(f"```json\n{code}\n```\n", encoding="utf-8")
+    Validator(documents=loose_documents(root, []), roots=[root]).run()
+
+    a = root / "a"
+    Validator(documents=loose_documents(a, []), roots=[a]).run()
+    validator = Validator(documents=loose_documents(root, []), roots=[root])
+    validator.run()
+    assert validator.checked == 0
+
+    (a / "README.md").unlink()
+    Validator(documents=loose_documents(root, []), roots=[root]).run()
+    validator = Validator(documents=loose_documents(root / "b", []), roots=[root / "b"])
+    assert list(validator.files) == [(root / "b" / "README.md").as_posix()]
+    assert len(validator.cache) == 1